@@ -28,3 +28,7 @@ class FurtherThanPositionLimitException(Warning):
 
 class SamePosition(Warning):
     pass
+
+
+class WorkersIgnored(Warning):
+    pass
@@ -0,0 +1,274 @@
+#!/usr/bin/env python3
+# -- In the name of God --
+# Project: massspring (mass+spring)
+# File: bench.py
+# Author: Pooya Shams kolahi
+# Inspired by Saeed Sarkarati
+
+
+"""
+bench.py
+
+benchmarks of the engine on a few canonical scenes, printed as json so
+the results of two versions (or two machines) can be compared.
+each scene runs in its own python process, so they don't affect each
+other and the startup and memory costs are measured properly.
+
+usage:
+python -m massspring.bench [--scenes cloth nbody] [--size 50] [--steps 100]
+                           [--backend numpy] [--set gravity=barnes_hut]
+                           [--parity [--tolerance 1e-9]] [--output results.json]
+"""
+
+import argparse
+import json
+import math
+import platform
+import random
+import subprocess
+import sys
+import time
+
+try:
+    import resource
+except ImportError:  # windows
+    resource = None
+
+# Variables
+
+default_steps = 100
+default_tolerance = 1e-9  # of parity, relative to the largest position
+
+
+# scenes
+# each scene gets the massspring module and a size and builds a world.
+# they are deterministic, so every run builds the same world.
+
+def pendulum(m, size):
+    """ a chain of size masses hanging from a fixed one """
+    m.acceleration.y = -m.ge
+    top = m.mass(0, 250, 0, moveable=False, solid=False)
+    last = top
+    for i in range(size):
+        new = m.mass((i + 1) * 400 / size, 250, 0, r=2, solid=False)
+        m.spring(last, new, k=1000)
+        last = new
+
+
+def cloth(m, size):
+    """ a size*size grid of masses and springs hanging from its top row """
+    m.acceleration.y = -m.ge
+    step = 400 / size
+    grid = [[m.mass(-200 + i * step, 250 - j * step, 0, r=1, solid=False, moveable=j != 0)
+             for j in range(size)] for i in range(size)]
+    for i in range(size):
+        for j in range(size):
+            if i + 1 < size:
+                m.spring(grid[i][j], grid[i + 1][j], k=500)
+            if j + 1 < size:
+                m.spring(grid[i][j], grid[i][j + 1], k=500)
+
+
+def nbody(m, size):
+    """ a cloud of size gravitational masses """
+    rand = random.Random(0)
+    for _ in range(size):
+        d = 200 * rand.random() ** (1 / 3)
+        a = rand.uniform(0, 2 * math.pi)
+        b = math.acos(rand.uniform(-1, 1))
+        m.mass(d * math.sin(b) * math.cos(a), d * math.sin(b) * math.sin(a), d * math.cos(b),
+               m=1e12, r=1, solid=False, gravitational=True)
+
+
+def gas(m, size):
+    """ size charged masses, half positive and half negative """
+    rand = random.Random(0)
+    for i in range(size):
+        m.mass(rand.uniform(-250, 250), rand.uniform(-250, 250), rand.uniform(-250, 250),
+               vx=rand.uniform(-10, 10), vy=rand.uniform(-10, 10), vz=rand.uniform(-10, 10),
+               r=1, q=(1 if i % 2 else -1) * 1e-7, solid=False, electrical=True)
+
+
+def box(m, size):
+    """ size solid masses bouncing in the box of the window """
+    rand = random.Random(0)
+    for _ in range(size):
+        m.mass(rand.uniform(-250, 250), rand.uniform(-250, 250), rand.uniform(-250, 250),
+               vx=rand.uniform(-100, 100), vy=rand.uniform(-100, 100), vz=rand.uniform(-100, 100),
+               r=5)
+
+
+scenes = {
+    "pendulum": (pendulum, 100),
+    "cloth": (cloth, 30),
+    "nbody": (nbody, 200),
+    "gas": (gas, 200),
+    "box": (box, 200),
+}
+
+
+# running
+
+def peak_memory():
+    """ returns the peak resident memory of the process in bytes (None on windows) """
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # kilobytes on linux, bytes on macos
+    return peak if sys.platform == "darwin" else peak * 1024
+
+
+def parse_value(m, value: str):
+    """ the value of a --set option: a name in massspring, a number or a string """
+    if hasattr(m, value):
+        return getattr(m, value)
+    try:
+        return json.loads(value)
+    except ValueError:
+        return value
+
+
+def run_scene(name: str, size: int = None, steps: int = default_steps,
+              backend: str = "pure", options: dict = None, positions: bool = False) -> dict:
+    """
+    builds the scene in this process and runs steps updates.
+    returns the results as a dictionary.
+    """
+    clock = time.perf_counter
+    # the import itself is measured in a new process (see startup_time)
+    import massspring  # noqa: F401 (the package, imported before the module)
+    m = sys.modules["massspring.massspring"]
+    build, default_size = scenes[name]
+    size = default_size if size is None else size
+    backend = m.use_backend(backend)
+    for option, value in (options or {}).items():
+        assert hasattr(m.settings, option), ValueError("unknown setting %r" % option)
+        setattr(m.settings, option, parse_value(m, value))
+    start = clock()
+    build(m, size)
+    build_time = clock() - start
+    start = clock()
+    m.initialize()
+    initialize_time = clock() - start
+    # update times its own phases (and forces) in stats when profiling
+    m.settings.profiling = True
+    m.update()  # compiling and warming the caches up
+    m.reset_stats()
+    start = clock()
+    for _ in range(steps):
+        m.update()
+    run_time = clock() - start
+    results = {
+        "scene": name,
+        "size": size,
+        "backend": backend,
+        "settings": {option: getattr(m.settings, option) for option in vars(m.settings)
+                     if not option.startswith("_")},
+        "masses": len(m.mass_lis),
+        "springs": len(m.spring_lis),
+        "force_objects": sum(len(lis) for lis in (m.gravity_lis, m.electricity_lis,
+                                                   m.collision_lis, m.air_resistance_lis)),
+        "steps": steps,
+        "build_time": build_time,
+        "initialize_time": initialize_time,
+        "steps_per_second": steps / run_time if run_time else None,
+        "phases": {phase: time / steps for phase, time in m.stats.phases.items()},
+        "forces": {name: time / steps for name, time in m.stats.forces.items()},
+        "collisions": m.stats.collisions,
+        "peak_memory": peak_memory(),
+    }
+    if positions:
+        results["positions"] = [(p.x, p.y, p.z) for p in m.mass_lis]
+    return results
+
+
+def run_child(name: str, size: int, steps: int, backend: str, options: dict, positions: bool = False) -> dict:
+    """ run_scene in a new python process """
+    command = [sys.executable, "-m", "massspring.bench", "--child", name,
+               "--steps", str(steps), "--backend", backend]
+    if size is not None:
+        command += ["--size", str(size)]
+    for option, value in options.items():
+        command += ["--set", "%s=%s" % (option, value)]
+    if positions:
+        command.append("--positions")
+    start = time.perf_counter()
+    output = subprocess.run(command, stdout=subprocess.PIPE, check=True).stdout
+    results = json.loads(output)
+    results["process_time"] = time.perf_counter() - start
+    return results
+
+
+def startup_time() -> float:
+    """ returns the time importing massspring takes in a new process """
+    def run(code):
+        start = time.perf_counter()
+        subprocess.run([sys.executable, "-c", code], check=True)
+        return time.perf_counter() - start
+    return run("import massspring") - run("pass")
+
+
+def parity(name: str, size: int, steps: int, options: dict, tolerance: float = default_tolerance) -> dict:
+    """
+    runs the scene with every backend that can run here and returns the
+    largest difference of the final positions from the pure backend and
+    whether it is within tolerance (relative to the largest position).
+    (the tests in tests/test_backends.py check the backends on more scenes)
+    """
+    reference = run_child(name, size, steps, "pure", options, positions=True)["positions"]
+    scale = max((abs(a) for p in reference for a in p), default=0.) or 1.
+    differences = {}
+    for backend in ("numpy", "numba"):
+        results = run_child(name, size, steps, backend, options, positions=True)
+        if results["backend"] != backend:
+            continue  # numba is not installed
+        difference = max((abs(a - b) for p, q in zip(reference, results["positions"])
+                          for a, b in zip(p, q)), default=0.)
+        differences[backend] = {"difference": difference, "passed": difference <= tolerance * scale}
+    return differences
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="python -m massspring.bench", description=__doc__.split("\n\n")[1])
+    parser.add_argument("--scenes", nargs="+", choices=list(scenes), default=list(scenes))
+    parser.add_argument("--size", type=int, help="the size of the scenes (each one has a default)")
+    parser.add_argument("--steps", type=int, default=default_steps)
+    parser.add_argument("--backend", default="pure", choices=("pure", "numpy", "numba"))
+    parser.add_argument("--set", action="append", default=[], metavar="SETTING=VALUE",
+                        help="changes massspring.settings, e.g. --set gravity=barnes_hut")
+    parser.add_argument("--parity", action="store_true",
+                        help="checks the final positions of the backends against pure")
+    parser.add_argument("--tolerance", type=float, default=default_tolerance,
+                        help="the largest difference --parity allows, relative to the largest position")
+    parser.add_argument("--output", help="writes the json into this file instead of printing it")
+    parser.add_argument("--child", choices=list(scenes), help=argparse.SUPPRESS)
+    parser.add_argument("--positions", action="store_true", help=argparse.SUPPRESS)
+    args = parser.parse_args(argv)
+    options = dict(option.split("=", 1) for option in args.set)
+    if args.child:
+        # running one scene for the parent process
+        results = run_scene(args.child, args.size, args.steps, args.backend, options, args.positions)
+        print(json.dumps(results))
+        return 0
+    report = {
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "startup_time": startup_time(),
+        "scenes": [run_child(name, args.size, args.steps, args.backend, options) for name in args.scenes],
+    }
+    failed = False
+    if args.parity:
+        report["parity"] = {name: parity(name, args.size, args.steps, options, args.tolerance)
+                            for name in args.scenes}
+        failed = not all(result["passed"] for scene in report["parity"].values() for result in scene.values())
+    report = json.dumps(report, indent=4)
+    if args.output:
+        with open(args.output, "w") as file:
+            file.write(report + "\n")
+    else:
+        print(report)
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -15,14 +15,24 @@ you can create many types of objects from which
 "mass" and "spring" are main ones.
 """
 
+import array
 import functools
+import importlib
+import itertools
+import json
+import os
 import warnings
+from concurrent.futures import ThreadPoolExecutor
 from math import hypot, pi
-
-import pygame
+from time import perf_counter
 
 import massspring.Exceptions as Exceptions
 
+try:
+    import numpy as np
+except ImportError:  # numpy is only needed by the array backed world
+    np = None
+
 # variables
 # physical constants
 # dt is delta time -> time difference between two sections; measured in seconds.
@@ -56,13 +66,164 @@ da = 1.2
 ge = 9.8
 c = 299792458
 
+# the lists of the world
+
+uids = itertools.count()  # the stable ids of the masses
+
+
+class registry(list):
+    """
+    the list of the objects of one type in the world.
+    it is a normal list but it finds (index) and removes (remove) the
+    objects in O(1), using slots: a dictionary of the objects (their id,
+    or their uid if ids is True) to their indexes. slots is only made
+    when it is needed first and made again after the list is reordered,
+    so the lists which never remove anything don't keep it.
+    if ids is True each object gets a stable integer id (uid) when it is
+    added, which get finds it by.
+    remove (and swap_pop) move the last object into the index of the
+    removed one, so they change the order of the list.
+    changes is the number of changes made to the list (adding, removing
+    or reordering objects), so the caches of it can tell if it is changed.
+    """
+
+    def __init__(self, objects=(), ids=False):
+        super().__init__()
+        self.ids = ids
+        self.slots = None
+        self.changes = 0
+        self.extend(objects)
+
+    def key(self, obj):
+        """ returns the key of obj in slots """
+        return getattr(obj, "uid", None) if self.ids else id(obj)
+
+    def _slots(self):
+        if self.slots is None:
+            key = self.key
+            self.slots = {key(obj): i for i, obj in enumerate(self)}
+        return self.slots
+
+    def append(self, obj):
+        if self.ids and getattr(obj, "uid", None) is None:
+            obj.uid = next(uids)
+        if self.slots is not None:
+            self.slots[self.key(obj)] = len(self)
+        super().append(obj)
+        self.changes += 1
+
+    def extend(self, objects):
+        for obj in objects:
+            self.append(obj)
+
+    def __iadd__(self, objects):
+        self.extend(objects)
+        return self
+
+    def get(self, uid):
+        """ returns the object having the uid """
+        assert self.ids, TypeError("the objects of this list don't have uids")
+        return self[self._slots()[uid]]
+
+    def index(self, obj, *args):
+        if args:
+            return super().index(obj, *args)
+        i = self._slots().get(self.key(obj))
+        if i is None or self[i] is not obj:
+            raise ValueError("the object is not in the list")
+        return i
+
+    def __contains__(self, obj):
+        i = self._slots().get(self.key(obj))
+        return i is not None and self[i] is obj
+
+    def remove(self, obj):
+        i = self.index(obj)
+        slots = self.slots
+        del slots[self.key(obj)]
+        last = super().pop()
+        if last is not obj:
+            super().__setitem__(i, last)
+            slots[self.key(last)] = i
+        self.changes += 1
+
+    def swap_pop(self, i=-1):
+        """ removes and returns the object at index i like remove (O(1), changes the order) """
+        obj = self[i]
+        self.remove(obj)
+        return obj
+
+    def remove_where(self, condition):
+        """
+        removes all of the objects for which condition(obj) is True in
+        one pass, keeping the order of the others. returns their number.
+        """
+        kept = [obj for obj in self if not condition(obj)]
+        removed = len(self) - len(kept)
+        if removed:
+            super().__setitem__(slice(None), kept)
+            self.slots = None
+            self.changes += 1
+        return removed
+
+    # the rest of the changes make slots again when it is needed
+
+    def pop(self, i=-1):
+        obj = super().pop(i)
+        slots = self.slots
+        if slots is not None and slots.get(self.key(obj)) == len(self):
+            del slots[self.key(obj)]  # it was the last one
+        else:
+            self.slots = None
+        self.changes += 1
+        return obj
+
+    def clear(self):
+        super().clear()
+        self.slots = None
+        self.changes += 1
+
+    def insert(self, i, obj):
+        if self.ids and getattr(obj, "uid", None) is None:
+            obj.uid = next(uids)
+        super().insert(i, obj)
+        self.slots = None
+        self.changes += 1
+
+    def sort(self, *args, **kwargs):
+        super().sort(*args, **kwargs)
+        self.slots = None
+        self.changes += 1
+
+    def reverse(self):
+        super().reverse()
+        self.slots = None
+        self.changes += 1
+
+    def __setitem__(self, i, value):
+        super().__setitem__(i, value)
+        if self.ids:
+            for obj in self:
+                if getattr(obj, "uid", None) is None:
+                    obj.uid = next(uids)
+        self.slots = None
+        self.changes += 1
+
+    def __delitem__(self, i):
+        super().__delitem__(i)
+        self.slots = None
+        self.changes += 1
+
+
 # programming variables
-mass_lis = []  # list of all masses
-spring_lis = []  # list of all springs
-gravity_lis = []  # list of all gravity forces
-electricity_lis = []  # list of all electricity forces
-collision_lis = []  # list of all possible collisions made by masses
-air_resistance_lis = []  # list of masses having air resistance force enabled
+mass_lis = registry(ids=True)  # list of all masses
+spring_lis = registry()  # list of all springs
+gravity_lis = registry()  # list of all gravity forces
+electricity_lis = registry()  # list of all electricity forces
+collision_lis = registry()  # list of all possible collisions made by masses
+air_resistance_lis = registry()  # list of masses having air resistance force enabled
+update_hooks = []  # functions called (without arguments) after each update
+removed_masses = {}  # id: the removed masses whose pair forces are still in their lists
 same_pos_warn_message = "Objects %s and %s with indexes of %d and %d in\
  the list mass_lis are at the same position. can't set %s force to them."
 ms = "mass"
@@ -71,6 +232,24 @@ el = "electricity"
 gv = "gravity"
 cl = "collision"
 ar = "air resistance"
+# the ways of calculating the automated forces (see settings)
+pairs = "pairs"  # one force object for each pair of masses
+implicit = "implicit"  # each pair of masses, without force objects
+barnes_hut = "barnes hut"  # an octree over the masses (just gravity)
+grid = "grid"  # a uniform grid finding the masses near each other
+neighbours = "neighbours"  # verlet neighbour lists with a cutoff radius
+# the integrators moving the masses (see settings)
+euler = "euler"  # semi-implicit euler
+leapfrog = "leapfrog"
+verlet = "verlet"  # velocity verlet
+rk4 = "rk4"  # runge-kutta 4
+# the renderers drawing the world (see settings)
+objects = "objects"  # each mass and spring draws itself
+batched = "batched"  # all of them at once with numpy
+# the levels of validation (see settings); objects is the classic one
+strict = "strict"  # all masses at once after each update
+sampled = "sampled"  # all masses at once every validate_every updates
+off = "off"
 INT_MIN = -2147483648  # -2 ** 31
 INT_MAX = +2147483647  # 2 ** 31 - 1
 
@@ -81,6 +260,27 @@ WINH = 600  # window height (|)
 WIND = 600  # window depth  (.)
 
 
+# modules
+
+class lazy_module:
+    """
+    stands in for a module which is imported the first time one of
+    its attributes is used. pygame is only needed when drawing, so
+    headless simulations (see step and simulate) never import it.
+    """
+
+    def __init__(self, name):
+        self.name = name
+
+    def __getattr__(self, attr):
+        module = importlib.import_module(self.name)
+        globals()[self.name] = module
+        return getattr(module, attr)
+
+
+pygame = lazy_module("pygame")
+
+
 # functions
 
 def sign(x):
@@ -92,9 +292,23 @@ def sign(x):
     return 0
 
 
+def warn(warning):
+    """
+    warnings.warn, counting the warning in stats when profiling.
+    the warning is shown as if it was raised where warn was called.
+    """
+    if settings.profiling:
+        name = type(warning).__name__
+        stats.warnings[name] = stats.warnings.get(name, 0) + 1
+    warnings.warn(warning, stacklevel=2)
+
+
 def warn_same_pos(m1, m2, name):
     """ warns when two masses are exactly on the same position """
-    warnings.warn(Exceptions.SamePosition(
+    if settings.validation != objects:
+        # validate reports them all together
+        return
+    warn(Exceptions.SamePosition(
         same_pos_warn_message %
         (m1, m2, m1._index(), m2._index(), name)))
 
@@ -174,6 +388,158 @@ class limit:
         vz = c
         v = c
 
+
+class settings:
+    """
+    switches of the optional parts of the engine.
+    the defaults are the classic behaviour.
+    gravity is the way gravity forces are calculated;
+        pairs, implicit or barnes_hut.
+        implicit (which is also a choice for electricity and collision)
+        calculates the force between each pair of masses having the flag
+        (gravitational, electrical, solid) directly, without creating
+        force objects for them. force objects created manually still work.
+    theta is the opening angle of barnes_hut. a node of the octree is
+        used instead of its masses if (its size / distance) < theta.
+        0 means exact (but slower than pairs), 0.5 is the usual value.
+    collision is the way collisions are found; pairs, implicit or grid.
+        grid puts the solid masses in a uniform grid with cells as big
+        as the largest diameter and just checks the masses in the same
+        or neighbouring cells.
+    electricity is the way electricity forces are calculated;
+        pairs, implicit or neighbours. neighbours ignores the masses further than cutoff
+        and keeps a list of the pairs closer than cutoff + skin, which is
+        only built again when a mass has moved more than skin / 2.
+    cutoff is the distance further than which there is no electricity
+        force in neighbours mode.
+    skin is the extra distance of the neighbour lists.
+    backend is the backend of the engine; "pure", "numpy" or "numba"
+        (see use_backend, don't change it yourself).
+    integrator is the way masses are moved; euler, leapfrog, verlet or rk4.
+        euler (semi-implicit euler) is the classic mass.move.
+        leapfrog is euler with half of the first velocity step, so the
+        velocities are half a step ahead of the positions, which makes it
+        second order with the same cost.
+        verlet (velocity verlet) is second order too and keeps the
+        velocities at the same time as the positions. it sets the forces
+        of the new positions at the end of each update and the next update
+        uses them instead of setting them again (see simulation.carried).
+        rk4 (runge-kutta 4) is fourth order and calculates the forces
+        four times in each update.
+    adaptive means if dt is chosen again before each update or not.
+        the new dt is the smallest of these, kept between dt_min and dt_max:
+        tolerance * (smallest radius) / (largest speed),
+        (tolerance * (smallest radius) / (largest acceleration)) ^ 0.5 and
+        tolerance / (angular frequency of the stiffest spring).
+    workers is the number of threads setting the springs and the implicit
+        gravity and electricity forces in the array backed world. 0 is the
+        classic serial solvers. any other number splits the work into
+        chunks which only depend on the number of masses and springs (not
+        on workers) and adds them up in order, so the results are exactly
+        the same for any number of workers. numpy and the numba kernels
+        release the GIL, so the threads really run at the same time.
+        the other forces (and all of them in the pure backend) are set by
+        one thread, which is warned about once for each of them.
+    renderer is the way the world is drawn; objects or batched.
+        objects calls show of each mass and spring.
+        batched (which needs numpy) finds the screen positions and colors
+        of all of them at once, keeps the depth order of the last frame
+        (which is only sorted again a little) and draws the springs as
+        pixels. the colors, radii and visible flags are cached, so if you
+        change them, set render_cache.dirty to True.
+    profiling means if update records the time of its phases and of each
+        type of force, the number of collisions and warnings and so on in
+        stats or not.
+    validation is the way the speed and position limits and the masses at
+        the same position are checked; objects, strict, sampled or off.
+        objects is the classic way, each mass checks itself when moving
+        and each force warns about its masses at the same position.
+        strict checks all masses at once (see validate) after each update
+        and raises one warning for each kind of problem, sampled does the
+        same every validate_every updates and off checks nothing.
+    """
+    backend = "pure"
+    integrator = euler
+    adaptive = False
+    dt_min = 1e-6
+    dt_max = .01
+    tolerance = .1
+    workers = 0
+    renderer = objects
+    profiling = False
+    validation = objects
+    validate_every = 100
+    gravity = pairs
+    theta = .5
+    collision = pairs
+    electricity = pairs
+    cutoff = 100
+    skin = 10
+
+
+class simulation:
+    """
+    the state of the running simulation.
+    initialized means if initialize has been called or not.
+    steps is the number of updates done.
+    time is the simulated time; measured in seconds.
+    staggered means if the velocities are half a step ahead of positions,
+        which is done by the first update of leapfrog.
+    last_dt is the dt of the last update of leapfrog; the velocities are
+        half of it ahead of the positions (see leapfrog_step).
+    carried is the forces verlet set at the end of the last update and
+        the state of the world they were set for (see carry_forces). the
+        next update uses them if the masses, their positions and velocities
+        and the number of force objects haven't changed, so if you change
+        the forces in another way (like the k of a spring), set it to None.
+    """
+    initialized = False
+    steps = 0
+    time = 0
+    staggered = False
+    last_dt = 0
+    carried = None
+
+
+class stats:
+    """
+    the counters of profiling (see settings.profiling and reset_stats).
+    updates is the number of profiled updates.
+    phases is the time (in seconds) spent in each phase of update.
+    forces is the time spent setting each type of force.
+    objects is the number of force objects of each type which were set.
+    collisions is the number of collisions resolved.
+    warnings is the number of warnings raised of each type.
+    """
+    updates = 0
+    phases = {}
+    forces = {}
+    objects = {}
+    collisions = 0
+    warnings = {}
+
+
+def reset_stats():
+    """ sets all of the counters of stats to zero """
+    stats.updates = 0
+    stats.phases = {}
+    stats.forces = {}
+    stats.objects = {}
+    stats.collisions = 0
+    stats.warnings = {}
+
+
+def stats_dict():
+    """ returns a copy of stats as a dictionary (which can be saved as json) """
+    return {
+        "updates": stats.updates,
+        "phases": dict(stats.phases),
+        "forces": dict(stats.forces),
+        "objects": dict(stats.objects),
+        "collisions": stats.collisions,
+        "warnings": dict(stats.warnings),
+    }
+
 # objects(physical meaning) classes
 # mass
 
@@ -207,7 +573,26 @@ class mass:
         electrical charge with others or not.
     color is the objects default color.
         visible means if the object is seen or not.
+
+    the attributes are kept in __slots__. you can still add your own
+    attributes, which are kept in a __dict__ made when the first one is
+    added. a mass stays in the world until its remove method is called.
     """
+    # _i is the index of an array_mass in the arrays. the subclasses of
+    # mass get an array class of their own (see array_class).
+    # uid is the id given by mass_lis and _forces are the linked force
+    # objects applied to the mass (see force.link), made by the first one.
+    __slots__ = ("x", "y", "z", "vx", "vy", "vz", "fx", "fy", "fz",
+                 "m", "r", "q", "moveable", "solid", "bound", "gravitational",
+                 "resistible", "electrical", "conductive", "color", "visible",
+                 "uid", "_forces", "_i", "__dict__", "__weakref__")
+
+    def __new__(cls, *args, **kwargs):
+        # when the array backed world is enabled every new mass
+        # is created as a handle into the arrays (see use_arrays).
+        if arrays.enabled:
+            cls = array_class(cls)
+        return super().__new__(cls)
 
     def __init__(self,
                  x=0, y=0, z=0, vx=0, vy=0, vz=0,
@@ -251,16 +636,33 @@ class mass:
 
     def _index(self):
         """ returns the index of the object in the mass_lis """
-        for i, m in enumerate(mass_lis):
-            if m == self:
-                return i
+        try:
+            return mass_lis.index(self)
+        except ValueError:
+            return None
 
-    def __del__(self):
-        """ deletes the mass and removes it from mass list """
+    def linked_forces(self):
+        """ returns the linked force objects applied to the mass (see force.link) """
         try:
-            mass_lis.remove(self)
-        except Exception as e:
-            print(f"[Error] when deleting {ms}: {e}")
+            return list(self._forces)
+        except AttributeError:
+            return []
+
+    def forces(self):
+        """
+        returns the force objects applied to the mass.
+        the pair forces which are not linked are found by searching their lists.
+        """
+        compact_forces()
+        return self.linked_forces() + [obj for f in automated_two_object_forces
+                                       for obj in f.object_list if obj.m1 is self or obj.m2 is self]
+
+    def remove(self):
+        """
+        removes the mass and the force objects applied to it from the world
+        (see remove_masses).
+        """
+        remove_masses([self])
 
     def v(self):
         """ returns the velocity of the object """
@@ -306,7 +708,7 @@ class mass:
         tmpv = self.v()
         if tmpv >= limit.MAX.v:  # tmpv is higher than 0
             # the mass has reached the speed of light in vacuum (or MORE)
-            warnings.warn(Exceptions.FasterThanSpeedLimitException(
+            warn(Exceptions.FasterThanSpeedLimitException(
                 f"can't go faster than {c}, the speed is {tmpv}"))
 
     def check_position_exceeds_limit(self):
@@ -315,35 +717,42 @@ class mass:
         higher than INT_MAX or lower than INT_MIN
         """
         if not limit.MIN.x < self.x < limit.MAX.x:
-            warnings.warn(Exceptions.FurtherThanPositionLimitException(
+            warn(Exceptions.FurtherThanPositionLimitException(
                 f"can't place mass.x out of ({limit.MIN.x},{limit.MAX.x}), x is {self.x}"))
         if not limit.MIN.y < self.y < limit.MAX.y:
-            warnings.warn(Exceptions.FurtherThanPositionLimitException(
+            warn(Exceptions.FurtherThanPositionLimitException(
                 f"can't place mass.y out of ({limit.MIN.y},{limit.MAX.y}), y is {self.y}"))
         if not limit.MIN.z < self.z < limit.MAX.z:
-            warnings.warn(Exceptions.FurtherThanPositionLimitException(
+            warn(Exceptions.FurtherThanPositionLimitException(
                 f"can't place mass.z out of ({limit.MIN.z},{limit.MAX.z}), z is {self.z}"))
 
+    def accelerations(self):
+        """
+        returns the acceleration of the object in 3 directions
+        according to newtons second law -> f = ma => a = f/m
+        plus the default acceleration.
+        """
+        return (self.fx / self.m + acceleration.x,
+                self.fy / self.m + acceleration.y,
+                self.fz / self.m + acceleration.z)
+
     def move(self):
         """
         moves the object according to
         newtons second law -> f = ma => a = f/m
         """
         if self.moveable:
-            # attention! self.ax(), self.ay() and self.az() are
-            # calculated by vx/dt, vy/dt and vz/dt
-            ax, ay, az = self.fx / self.m, self.fy / self.m, self.fz / self.m
-            ax += acceleration.x
-            ay += acceleration.y
-            az += acceleration.z
+            ax, ay, az = self.accelerations()
             self.vx += ax * dt
             self.vy += ay * dt
             self.vz += az * dt
-            self.check_speed_exceeds_limit()
+            if settings.validation == objects:
+                self.check_speed_exceeds_limit()
             self.x += self.vx * dt
             self.y += self.vy * dt
             self.z += self.vz * dt
-            self.check_position_exceeds_limit()
+            if settings.validation == objects:
+                self.check_position_exceeds_limit()
 
     def show_pos_xy(self):
         """ returns the position of the mass on the screen (just x and y) """
@@ -386,6 +795,224 @@ class mass:
             self.show_zy(win_zy)
 
 
+# the array backed world
+
+class mass_arrays:
+    """
+    the storage of the array backed world.
+    when enabled (see use_arrays) the state of every mass lives in
+    contiguous float64 numpy arrays and the mass objects are just
+    handles holding their index in them (see array_mass).
+    this lets empty_all_forces, reflect_all and move_all work on
+    all of the masses at once instead of one object at a time.
+
+    attributes:
+    n is the number of masses in the arrays.
+    pos, vel and frc are n*3 arrays of positions, velocities and forces.
+    m, r and q are arrays of mass, radius and charge.
+    the boolean arrays are named after the mass flags (moveable, ...).
+    owners is the list of mass objects, owners[i] lives in index i.
+    version is increased each time the indexes of masses change.
+    """
+    vectors = ("pos", "vel", "frc")
+    scalars = ("m", "r", "q")
+    flags = ("moveable", "solid", "bound", "gravitational",
+             "resistible", "electrical", "conductive")
+
+    def __init__(self):
+        self.enabled = False
+        self.n = 0
+        self.version = 0
+        self.owners = []
+        self.capacity = 0
+
+    def allocate(self, capacity):
+        """ (re)allocates the arrays keeping the first n values """
+        if np is None:
+            raise ImportError("the array backed world needs numpy")
+        capacity = max(capacity, self.n, 1)
+        for name in self.vectors:
+            self._resize(name, np.zeros((capacity, 3)))
+        for name in self.scalars:
+            self._resize(name, np.zeros(capacity))
+        for name in self.flags:
+            self._resize(name, np.zeros(capacity, dtype=bool))
+        self.capacity = capacity
+
+    def _resize(self, name, new):
+        old = getattr(self, name, None)
+        if old is not None:
+            new[:self.n] = old[:self.n]
+        setattr(self, name, new)
+
+    def add(self, obj):
+        """ gives a new index to obj and returns it """
+        if self.n == self.capacity:
+            self.allocate(self.capacity * 2)
+        i = self.n
+        self.n += 1
+        self.owners.append(obj)
+        return i
+
+    def remove(self, obj):
+        """
+        removes obj from the arrays by moving the last mass into its index.
+        the index of the moved mass changes, so the version is increased.
+        """
+        i = obj._i
+        last = self.n - 1
+        if i != last:
+            for name in self.vectors + self.scalars + self.flags:
+                array = getattr(self, name)
+                array[i] = array[last]
+            moved = self.owners[last]
+            moved._i = i
+            self.owners[i] = moved
+        self.owners.pop()
+        self.n -= 1
+        self.version += 1
+
+
+arrays = mass_arrays()
+
+
+def array_attribute(name, column=None, doc=None):
+    """
+    returns a property that reads and writes arrays.<name>[index]
+    (or arrays.<name>[index, column] for the vector arrays)
+    """
+    if column is None:
+        def getter(self):
+            return getattr(arrays, name)[self._i].item()
+
+        def setter(self, value):
+            getattr(arrays, name)[self._i] = value
+    else:
+        def getter(self):
+            return getattr(arrays, name)[self._i, column].item()
+
+        def setter(self, value):
+            getattr(arrays, name)[self._i, column] = value
+    return property(getter, setter, doc=doc)
+
+
+class array_mass(mass):
+    """
+    a mass which keeps its state in the arrays of the array backed world.
+    it behaves just like a mass (same attributes and methods) but
+    the attributes are read from and written to the arrays.
+    you won't need to create it yourself, every mass created after
+    calling use_arrays is an array_mass (see array_class for the
+    subclasses of mass).
+    """
+    x = array_attribute("pos", 0)
+    y = array_attribute("pos", 1)
+    z = array_attribute("pos", 2)
+    vx = array_attribute("vel", 0)
+    vy = array_attribute("vel", 1)
+    vz = array_attribute("vel", 2)
+    fx = array_attribute("frc", 0)
+    fy = array_attribute("frc", 1)
+    fz = array_attribute("frc", 2)
+    m = array_attribute("m")
+    r = array_attribute("r")
+    q = array_attribute("q")
+    moveable = array_attribute("moveable")
+    solid = array_attribute("solid")
+    bound = array_attribute("bound")
+    gravitational = array_attribute("gravitational")
+    resistible = array_attribute("resistible")
+    electrical = array_attribute("electrical")
+    conductive = array_attribute("conductive")
+
+    __slots__ = ()
+
+    def __init__(self, *args, **kwargs):
+        self._i = arrays.add(self)
+        try:
+            super().__init__(*args, **kwargs)
+        except Exception:
+            arrays.remove(self)
+            raise
+
+    def v(self):
+        """ returns the velocity of the object """
+        return hypot(*arrays.vel[self._i].tolist())
+
+    def f(self):
+        """ returns the force of the object from all directions """
+        return hypot(*arrays.frc[self._i].tolist())
+
+    def empty_forces(self):
+        """ sets the objects forces to 0 """
+        arrays.frc[self._i] = 0
+
+    def update_forces(self, fx, fy, fz):
+        """ adds the given forces to the mass """
+        arrays.frc[self._i] += (fx, fy, fz)
+
+
+# the names of the mass attributes kept in the arrays
+array_attributes = [name for name, value in vars(array_mass).items()
+                    if isinstance(value, property)]
+# the classes of the masses in the arrays and the other way around
+array_classes = {mass: array_mass}
+plain_classes = {array_mass: mass}
+
+
+def array_class(cls):
+    """
+    returns the class of the masses of class cls in the array backed world.
+    it is array_mass for mass, and for a subclass of mass it is a subclass
+    of both of them (made once), so its own methods and attributes are kept
+    and the ones of mass are read from the arrays.
+    """
+    if cls in plain_classes:
+        return cls
+    if cls not in array_classes:
+        new = type(cls.__name__, (cls, array_mass), {
+            "__slots__": (), "__module__": cls.__module__, "__qualname__": cls.__qualname__,
+            "__doc__": cls.__doc__})
+        array_classes[cls] = new
+        plain_classes[new] = cls
+    return array_classes[cls]
+
+
+def use_arrays(enabled=True, capacity=1024):
+    """
+    enables (or disables) the array backed world.
+    the masses that already exist are moved into (or out of) the arrays,
+    and every mass created afterwards will be an array_mass.
+    """
+    if enabled == arrays.enabled:
+        return
+    if enabled:
+        arrays.allocate(capacity)
+        arrays.enabled = True
+        for m in mass_lis:
+            values = {name: getattr(m, name) for name in array_attributes}
+            for name in array_attributes:
+                # emptying the slots hidden by the properties of array_mass
+                getattr(mass, name).__delete__(m)
+            m.__class__ = array_class(type(m))
+            m._i = arrays.add(m)
+            for name, value in values.items():
+                setattr(m, name, value)
+    else:
+        for m in list(arrays.owners):
+            values = {name: getattr(m, name) for name in array_attributes}
+            arrays.remove(m)
+            del m._i
+            m.__class__ = plain_classes[type(m)]
+            for name, value in values.items():
+                setattr(m, name, value)
+        arrays.enabled = False
+    if not enabled:
+        settings.backend = "pure"
+    elif settings.backend == "pure":
+        settings.backend = "numpy"
+
+
 # Force's classes
 # main force
 
@@ -412,9 +1039,16 @@ class force:
     2. m2: second mass.
     3. name: is just a string of the force name which will be used when
     raising exceptions
+
+    a force stays in its object_list until its remove method is called.
+    the attributes are kept in __slots__ without a __dict__ (there can be
+    millions of force objects), so you can't add your own attributes to
+    the force objects, unless you make a subclass of the force.
     """
+    __slots__ = ("m1", "m2")
     object_list: list
     name: str
+    linked = True
 
     def __init__(self, *, m1: mass, m2: mass = None):
         if m2 is not None:
@@ -436,13 +1070,32 @@ class force:
         self.m2 = m2
         # self.name = name
         self.object_list.append(self)
+        self.link()
 
-    def __del__(self):
-        """ tries to remove the object from it's object_list """
-        try:
-            self.object_list.remove(self)
-        except Exception as e:
-            print(f"[Error] when deleting {self.name}: {e}")
+    def link(self):
+        """
+        adds the object to the forces of its masses, so they find it when
+        they are removed. the pair forces of gravity, electricity and
+        collision (linked = False) aren't linked to keep them small; there
+        is one for each pair of masses and they are found by searching.
+        """
+        if not self.linked:
+            return
+        for m in (self.m1, self.m2):
+            if m is None:
+                continue
+            try:
+                m._forces.append(self)
+            except AttributeError:
+                m._forces = [self]
+
+    def remove(self):
+        """ removes the object from it's object_list and the forces of its masses """
+        self.object_list.remove(self)
+        if self.linked:
+            self.m1._forces.remove(self)
+            if self.m2 is not None:
+                self.m2._forces.remove(self)
 
     @two_object_force
     def dx(self):
@@ -498,6 +1151,7 @@ class spring(force):
     visible (boolean): indicates if the object
     will be shown on the screen or not.
     """
+    __slots__ = ("k", "nl", "color", "visible")
     object_list = spring_lis
     name = sp
 
@@ -510,6 +1164,12 @@ class spring(force):
             self.nl = self.length()
         self.color = color
         self.visible = visible
+        spring_edges.dirty = True
+
+    def remove(self):
+        """ removes the spring from spring_lis """
+        super().remove()
+        spring_edges.dirty = True
 
     def length(self):
         """
@@ -562,7 +1222,9 @@ class gravity(force):
     the main gravity force class.
     uses the newton's law of gravity.
     """
+    __slots__ = ()
     object_list = gravity_lis
+    linked = False
     name = gv
 
     def __init__(self, m1: mass, m2: mass):
@@ -605,7 +1267,9 @@ class electricity(force):
     uses the Coulomb law for calculating
     the electricity force between two particles.
     """
+    __slots__ = ()
     object_list = electricity_lis
+    linked = False
     name = el
 
     def __init__(self, m1: mass, m2: mass):
@@ -650,10 +1314,15 @@ class electricity(force):
         checks if two objects are conductive and then
         equalises the electrical charge between them.
         """
-        if self.m1.conductive and self.m2.conductive:
-            q = (self.m1.q + self.m2.q) / 2
-            self.m1.q = q
-            self.m2.q = q
+        self.equalise(self.m1, self.m2)
+
+    @staticmethod
+    def equalise(m1: mass, m2: mass):
+        """ equalise_charge for two masses """
+        if m1.conductive and m2.conductive:
+            q = (m1.q + m2.q) / 2
+            m1.q = q
+            m2.q = q
 
 # collision
 
@@ -665,7 +1334,9 @@ class collision(force):
     I don't know why it works but according to wikipedia
     the formula and equation are driven from these two equations.
     """
+    __slots__ = ()
     object_list = collision_lis
+    linked = False
     name = cl
 
     def __init__(self, m1: mass, m2: mass):
@@ -684,23 +1355,38 @@ class collision(force):
 
     def set_force(self):
         """ collides two objects """
+        self.collide(self.m1, self.m2)
+
+    @staticmethod
+    def collide(mass1: mass, mass2: mass):
+        """
+        collides two masses if they have hit each other.
+        it is used by the collision objects and by the
+        collision modes that don't create them (see settings).
+        """
         # checking if the objects has collided
-        if not self.check_collision():
+        dx = mass1.x - mass2.x
+        dy = mass1.y - mass2.y
+        dz = mass1.z - mass2.z
+        d = hypot(dx, dy, dz)
+        if d > mass1.r + mass2.r:
             return
-        # saving variables
-        d, dx, dy, dz = self.d()
         if d == 0:
+            warn_same_pos(mass1, mass2, cl)
             return 0
-        m1 = self.m1.m
-        m2 = self.m2.m
-        u1x = self.m1.vx
-        u1y = self.m1.vy
-        u1z = self.m1.vz
-        u2x = self.m2.vx
-        u2y = self.m2.vy
-        u2z = self.m2.vz
-        u1 = self.m1.v()
-        u2 = self.m2.v()
+        if settings.profiling:
+            stats.collisions += 1
+        # saving variables
+        m1 = mass1.m
+        m2 = mass2.m
+        u1x = mass1.vx
+        u1y = mass1.vy
+        u1z = mass1.vz
+        u2x = mass2.vx
+        u2y = mass2.vy
+        u2z = mass2.vz
+        u1 = mass1.v()
+        u2 = mass2.v()
         # starting collision
         # calculating new velocities
         v1 = (u1 * (m1 - m2) + u2 * 2 * m2) / (m1 + m2)
@@ -725,12 +1411,12 @@ class collision(force):
         # calculating forces
         fx1, fy1, fz1 = a1x * m1, a1y * m1, a1z * m1
         fx2, fy2, fz2 = a2x * m2, a2y * m2, a2z * m2
-        self.m1.update_forces(fx1, fy1, fz1)
-        self.m2.update_forces(fx2, fy2, fz2)
+        mass1.update_forces(fx1, fy1, fz1)
+        mass2.update_forces(fx2, fy2, fz2)
         # the collision is done!
         # equalising the electrical charges of two objects
         # (if they are conductive)
-        electricity.equalise_charge(self)
+        electricity.equalise(mass1, mass2)
 
 # single mass forces
 # air resistance
@@ -743,6 +1429,7 @@ class air_resistance(force):
     the following formula and applies that force to the object.
     f = (p * v^2 * C * A) / 2
     """
+    __slots__ = ()
     object_list = air_resistance_lis
     name = ar
 
@@ -798,9 +1485,10 @@ def create_all_automated_forces():
     searches all the masses and creates force objects for
     each pair of the masses that the force applies to them
     """
+    paired = [f for f in automated_two_object_forces if by_pairs(f)]
     for i, m1 in enumerate(mass_lis):
-        for _, m2 in enumerate(mass_lis[i + 1:]):
-            for f in automated_two_object_forces:
+        for _, m2 in enumerate(mass_lis[i + 1:] if paired else ()):
+            for f in paired:
                 if f.condition(m1, m2):
                     f(m1, m2)
         for f in automated_one_object_forces:
@@ -808,42 +1496,1614 @@ def create_all_automated_forces():
                 f(m1)
 
 
+def remove_masses(masses):
+    """
+    removes the masses and the force objects applied to them from the world.
+    it takes O(number of the linked forces of the masses); the pair forces
+    which are not linked to the masses (see force.link) are left in their
+    lists and removed later by compact_forces.
+    """
+    masses = list(masses)
+    for m in masses:
+        mass_lis.index(m)  # raises ValueError before changing anything
+    for m in masses:
+        for obj in m.linked_forces():
+            obj.remove()
+        removed_masses[id(m)] = m
+    for m in masses:
+        mass_lis.remove(m)
+        if isinstance(m, array_mass):
+            arrays.remove(m)
+
+
+def compact_forces():
+    """
+    removes the pair forces of the removed masses (see remove_masses) from
+    their lists, in a single pass over each list for all of the masses
+    removed since the last time. it is called before the forces are set
+    (so it is done once per update at most) and by the functions reading
+    the lists, like forces and save_state.
+    """
+    if not removed_masses:
+        return
+    for f in automated_two_object_forces:
+        if f.object_list:
+            f.object_list.remove_where(lambda obj: id(obj.m1) in removed_masses or id(obj.m2) in removed_masses)
+    removed_masses.clear()
+
+
 def empty_all_forces():
+    if arrays.enabled:
+        arrays.frc[:arrays.n] = 0
+        return
     for m in mass_lis:
         m.empty_forces()
 
 
+def by_pairs(f):
+    """
+    returns True if the automated force f is calculated by
+    creating force objects for each pair of masses (see settings)
+    """
+    return getattr(settings, f.__name__, pairs) == pairs
+
+
+def set_forces(f):
+    """ sets the forces of the force class f """
+    compact_forces()
+    if settings.workers:
+        check_workers(f)
+    if not by_pairs(f):
+        # the force objects that still exist were created manually
+        pair_solvers[f, getattr(settings, f.__name__)]()
+    if arrays.enabled and f in batch_solvers:
+        batch_solvers[f]()
+        return
+    for obj in f.object_list:
+        obj.set_force()
+
+
+def profile_forces(f):
+    """ set_forces, recording its time in stats """
+    start = perf_counter()
+    set_forces(f)
+    stats.forces[f.name] = stats.forces.get(f.name, 0) + perf_counter() - start
+    stats.objects[f.name] = stats.objects.get(f.name, 0) + len(f.object_list)
+
+
 def set_all_forces():
+    if settings.integrator == verlet and restore_forces():
+        return
+    set_force = profile_forces if settings.profiling else set_forces
+    # the other integrators resolve the collisions in collide_all
+    skip = None if settings.integrator == euler else collision
     for force_lis in all_forces:
         for f in all_forces[force_lis]:
-            for obj in f.object_list:
-                obj.set_force()
+            if f is not skip:
+                set_force(f)
+
+
+def collide_all():
+    """
+    resolves the collisions once per update for the integrators other
+    than euler, by changing the velocities of the masses directly.
+    collide sets the change of velocity as a force for a single
+    euler step (f = m.dv/dt), which the integrators that set the forces
+    more than once or move the velocities by half steps would get wrong.
+    it is called by update after the forces are emptied.
+    """
+    if settings.integrator == euler:
+        return
+    (profile_forces if settings.profiling else set_forces)(collision)
+    if arrays.enabled:
+        n = arrays.n
+        moveable = arrays.moveable[:n]
+        arrays.vel[:n][moveable] += arrays.frc[:n][moveable] / arrays.m[:n, None][moveable] * dt
+    else:
+        for m in mass_lis:
+            if m.moveable:
+                m.vx += m.fx / m.m * dt
+                m.vy += m.fy / m.m * dt
+                m.vz += m.fz / m.m * dt
+    empty_all_forces()
 
 
 def reflect_all():
+    if arrays.enabled:
+        return reflect_arrays()
     for m in mass_lis:
         m.reflect()
 
 
 def move_all():
+    if settings.integrator != leapfrog:
+        simulation.staggered = False
+    if settings.integrator != verlet:
+        simulation.carried = None
+    if settings.integrator != euler:
+        return integrators[settings.integrator]()
+    if arrays.enabled:
+        return move_arrays()
     for m in mass_lis:
         m.move()
 
 
+def reflect_arrays():
+    """ mass.reflect for all of the masses in the arrays at once """
+    n = arrays.n
+    vel = arrays.vel[:n]
+    r = arrays.r[:n, None]
+    after = arrays.pos[:n] + vel * dt
+    # the same bounds as mass.reflect: -W // 2 + r < pos < W // 2 - r
+    low = np.array([-WINW // 2, -WINH // 2, -WIND // 2]) + r
+    high = np.array([WINW // 2, WINH // 2, WIND // 2]) - r
+    out = ~((low < after) & (after < high))
+    out &= arrays.bound[:n, None]
+    np.negative(vel, out=vel, where=out)
+
+
+def move_arrays():
+    """ mass.move for all of the masses in the arrays at once """
+    n = arrays.n
+    pos = arrays.pos[:n]
+    vel = arrays.vel[:n]
+    moveable = arrays.moveable[:n]
+    if settings.backend == "numba":
+        kernels.move(pos, vel, arrays.frc[:n], arrays.m[:n], moveable,
+                     acceleration.x, acceleration.y, acceleration.z, dt)
+        check_speed_arrays(moveable)
+        check_position_arrays(moveable)
+        return
+    acc = arrays.frc[:n] / arrays.m[:n, None]
+    acc += (acceleration.x, acceleration.y, acceleration.z)
+    if moveable.all():
+        vel += acc * dt
+        check_speed_arrays(moveable)
+        pos += vel * dt
+    else:
+        vel[moveable] += acc[moveable] * dt
+        check_speed_arrays(moveable)
+        pos[moveable] += vel[moveable] * dt
+    check_position_arrays(moveable)
+
+
+def check_speed_arrays(where):
+    """ mass.check_speed_exceeds_limit for the masses in the arrays """
+    if settings.validation != objects:
+        return
+    vel = arrays.vel[:arrays.n]
+    fast = np.einsum("ij,ij->i", vel, vel) >= limit.MAX.v ** 2
+    for i in np.flatnonzero(fast & where):
+        arrays.owners[i].check_speed_exceeds_limit()
+
+
+def check_position_arrays(where):
+    """ mass.check_position_exceeds_limit for the masses in the arrays """
+    if settings.validation != objects:
+        return
+    pos = arrays.pos[:arrays.n]
+    low = (limit.MIN.x, limit.MIN.y, limit.MIN.z)
+    high = (limit.MAX.x, limit.MAX.y, limit.MAX.z)
+    out = ~((low < pos) & (pos < high)).all(axis=1)
+    for i in np.flatnonzero(out & where):
+        arrays.owners[i].check_position_exceeds_limit()
+
+
+# integrators
+# the forces of the current positions are already set when they are
+# called (by update). the ones with more than one stage empty and set
+# the forces again for the other positions (see evaluate_forces).
+# the collisions are not part of these forces (see collide_all).
+
+def evaluate_forces():
+    """ empties and sets all of the forces again """
+    empty_all_forces()
+    set_all_forces()
+
+
+def moving():
+    """ returns the moveable masses (or a mask of them in the arrays) """
+    if arrays.enabled:
+        return arrays.moveable[:arrays.n, None]
+    return [m for m in mass_lis if m.moveable]
+
+
+def accelerations_arrays():
+    """ mass.accelerations for all of the masses in the arrays """
+    n = arrays.n
+    acc = arrays.frc[:n] / arrays.m[:n, None]
+    acc += (acceleration.x, acceleration.y, acceleration.z)
+    return acc
+
+
+def check_limits(movers):
+    """ checks the speed and position limits of the moved masses """
+    if settings.validation != objects:
+        return
+    if arrays.enabled:
+        check_speed_arrays(movers[:, 0])
+        check_position_arrays(movers[:, 0])
+        return
+    for m in movers:
+        m.check_speed_exceeds_limit()
+        m.check_position_exceeds_limit()
+
+
+def leapfrog_step():
+    """
+    v += a.dt, x += v.dt (like euler) but the first update
+    just moves the velocities half a step.
+    the velocities are at half of the last dt after the positions, so if
+    dt changes (see settings.adaptive) they are moved by the average of
+    the two half steps to get half of the new dt after them.
+    """
+    h = (simulation.last_dt + dt) / 2 if simulation.staggered else dt / 2
+    simulation.staggered = True
+    simulation.last_dt = dt
+    movers = moving()
+    if arrays.enabled:
+        n = arrays.n
+        arrays.vel[:n] += accelerations_arrays() * h * movers
+        arrays.pos[:n] += arrays.vel[:n] * dt * movers
+    else:
+        for m in movers:
+            ax, ay, az = m.accelerations()
+            m.vx += ax * h
+            m.vy += ay * h
+            m.vz += az * h
+            m.x += m.vx * dt
+            m.y += m.vy * dt
+            m.z += m.vz * dt
+    check_limits(movers)
+
+
+def verlet_step():
+    """
+    velocity verlet: v += a.dt/2, x += v.dt, then v += a.dt/2 again with
+    the forces of the new positions, which are kept for the next update
+    (see carry_forces).
+    """
+    movers = moving()
+    for stage in range(2):
+        if arrays.enabled:
+            n = arrays.n
+            arrays.vel[:n] += accelerations_arrays() * (dt / 2) * movers
+            if not stage:
+                arrays.pos[:n] += arrays.vel[:n] * dt * movers
+        else:
+            for m in movers:
+                ax, ay, az = m.accelerations()
+                m.vx += ax * dt / 2
+                m.vy += ay * dt / 2
+                m.vz += az * dt / 2
+                if not stage:
+                    m.x += m.vx * dt
+                    m.y += m.vy * dt
+                    m.z += m.vz * dt
+        if not stage:
+            evaluate_forces()
+    check_limits(movers)
+    carry_forces()
+
+
+def world_state():
+    """
+    returns the things the forces are calculated from: the masses (their
+    ids, the masses themselves keep the ids from being reused), their
+    positions and velocities and the number of force objects.
+    """
+    counts = tuple(len(f.object_list) for force_lis in all_forces for f in all_forces[force_lis])
+    if arrays.enabled:
+        n = arrays.n
+        owners = list(arrays.owners[:n])
+        return owners, [id(m) for m in owners], arrays.pos[:n].copy(), arrays.vel[:n].copy(), counts
+    return (list(mass_lis), [id(m) for m in mass_lis],
+            [(m.x, m.y, m.z, m.vx, m.vy, m.vz) for m in mass_lis], counts)
+
+
+def carry_forces():
+    """ keeps the forces of the masses and the state they were set for in simulation.carried """
+    if arrays.enabled:
+        forces = arrays.frc[:arrays.n].copy()
+    else:
+        forces = [(m.fx, m.fy, m.fz) for m in mass_lis]
+    simulation.carried = world_state(), forces
+
+
+def restore_forces():
+    """
+    sets the forces kept by carry_forces if the state of the world is
+    still the same (a collision or a reflection changes the velocities,
+    for example) and returns if it did.
+    """
+    if simulation.carried is None:
+        return False
+    (_, ids, *values), forces = simulation.carried
+    simulation.carried = None
+    _, now, *current = world_state()
+    if ids != now:
+        return False
+    for a, b in zip(values, current):
+        if not (np.array_equal(a, b) if arrays.enabled else a == b):
+            return False
+    if arrays.enabled:
+        arrays.frc[:arrays.n] = forces
+    else:
+        for m, (fx, fy, fz) in zip(mass_lis, forces):
+            m.fx, m.fy, m.fz = fx, fy, fz
+    return True
+
+
+def rk4_step():
+    """
+    the classic runge-kutta 4 over positions and velocities.
+    the forces are set for the three other stages.
+    """
+    movers = moving()
+    if arrays.enabled:
+        n = arrays.n
+        pos, vel = arrays.pos[:n], arrays.vel[:n]
+        x0, v0 = pos.copy(), vel.copy()
+        dx, dv = np.zeros_like(x0), np.zeros_like(v0)
+        for weight, h in ((1, dt / 2), (2, dt / 2), (2, dt), (1, 0)):
+            kx = vel * movers
+            kv = accelerations_arrays() * movers
+            dx += weight * kx
+            dv += weight * kv
+            if h:
+                pos[:] = x0 + kx * h
+                vel[:] = v0 + kv * h
+                evaluate_forces()
+        pos[:] = x0 + dx * (dt / 6)
+        vel[:] = v0 + dv * (dt / 6)
+    else:
+        x0 = [(m.x, m.y, m.z) for m in movers]
+        v0 = [(m.vx, m.vy, m.vz) for m in movers]
+        dx = [[0, 0, 0] for _ in movers]
+        dv = [[0, 0, 0] for _ in movers]
+        for weight, h in ((1, dt / 2), (2, dt / 2), (2, dt), (1, 0)):
+            for m, x, v, sx, sv in zip(movers, x0, v0, dx, dv):
+                kx = (m.vx, m.vy, m.vz)
+                kv = m.accelerations()
+                for i in range(3):
+                    sx[i] += weight * kx[i]
+                    sv[i] += weight * kv[i]
+                if h:
+                    m.x, m.y, m.z = (x[i] + kx[i] * h for i in range(3))
+                    m.vx, m.vy, m.vz = (v[i] + kv[i] * h for i in range(3))
+            if h:
+                evaluate_forces()
+        for m, x, v, sx, sv in zip(movers, x0, v0, dx, dv):
+            m.x, m.y, m.z = (x[i] + sx[i] * dt / 6 for i in range(3))
+            m.vx, m.vy, m.vz = (v[i] + sv[i] * dt / 6 for i in range(3))
+    check_limits(movers)
+
+
+integrators = {
+    leapfrog: leapfrog_step,
+    verlet: verlet_step,
+    rk4: rk4_step,
+}
+
+
+# the batched solvers
+
+class edge_list:
+    """
+    the springs compiled into index arrays of the array backed world.
+    i1 and i2 are the indexes of m1 and m2 of the springs in the arrays,
+    k and nl are the constants and the natural lengths of the springs.
+    it is compiled again whenever a spring is created or the indexes
+    of the masses change. if you change k or nl of a spring yourself,
+    set dirty to True (or call compile_springs).
+    """
+
+    def __init__(self):
+        self.dirty = True
+        self.version = -1
+        self.count = -1
+        self.i1 = self.i2 = self.k = self.nl = None
+
+    def outdated(self):
+        """ returns True if the springs should be compiled again """
+        return (self.dirty or self.version != arrays.version or
+                self.count != len(spring_lis))
+
+    def compile(self):
+        """ builds the index arrays from spring_lis """
+        self.i1 = np.array([s.m1._i for s in spring_lis], dtype=np.intp)
+        self.i2 = np.array([s.m2._i for s in spring_lis], dtype=np.intp)
+        self.k = np.array([s.k for s in spring_lis], dtype=float)
+        self.nl = np.array([s.nl for s in spring_lis], dtype=float)
+        self.dirty = False
+        self.version = arrays.version
+        self.count = len(spring_lis)
+
+
+spring_edges = edge_list()
+
+
+def compile_springs():
+    """ compiles spring_lis for the batched spring solver """
+    spring_edges.compile()
+
+
+def scatter_forces(i1, i2, f):
+    """
+    adds the n*3 forces f to the masses i1 and -f to the masses i2
+    (i1 and i2 are index arrays and may contain an index many times).
+    """
+    n = arrays.n
+    frc = arrays.frc
+    for axis in range(3):
+        column = f[:, axis]
+        frc[:n, axis] += np.bincount(i1, column, minlength=n)
+        frc[:n, axis] -= np.bincount(i2, column, minlength=n)
+
+
+def set_spring_forces():
+    """ spring.set_force for all of the springs at once """
+    if spring_edges.outdated():
+        spring_edges.compile()
+    e = spring_edges
+    if not len(e.i1):
+        return
+    if settings.workers:
+        return parallel_spring_forces()
+    if settings.backend == "numba":
+        if not kernels.spring(arrays.pos, arrays.frc, e.i1, e.i2, e.k, e.nl):
+            return
+        # some springs have zero length, the numpy code warns about them
+        # (the kernel skipped them just like the numpy code)
+        d = arrays.pos[e.i1] - arrays.pos[e.i2]
+        for i in np.flatnonzero(~d.any(axis=1)):
+            s = spring_lis[i]
+            warn_same_pos(s.m1, s.m2, s.name)
+        return
+    d = arrays.pos[e.i1] - arrays.pos[e.i2]
+    h = np.sqrt(np.einsum("ij,ij->i", d, d))
+    same = h == 0
+    if same.any():
+        for i in np.flatnonzero(same):
+            s = spring_lis[i]
+            warn_same_pos(s.m1, s.m2, s.name)
+        h[same] = 1
+    # f = -k * (h - nl) and fx, fy, fz = f * (dx, dy, dz) / h
+    f = -e.k * (h - e.nl) / h
+    f[same] = 0
+    scatter_forces(e.i1, e.i2, d * f[:, None])
+
+
+# force classes that can be set all at once when the arrays are enabled
+batch_solvers = {
+    spring: set_spring_forces,
+}
+
+
+# implicit pair forces
+
+def row_blocks(n, rows=None):
+    """
+    yields slices of rows of an n*n table, each one having the given
+    number of rows (by default small enough to calculate without using
+    too much memory, about 2^20 cells).
+    """
+    if rows is None:
+        rows = max(1, 2 ** 20 // max(n, 1))
+    for start in range(0, n, rows):
+        yield slice(start, min(start + rows, n))
+
+
+def row_forces(pos, a, scale, rows):
+    """
+    returns the forces on the bodies in rows from all of the other bodies
+    (see implicit_forces) and the pairs (i, j), i < j, on the same position.
+    """
+    d = pos[rows, None, :] - pos[None, :, :]
+    h = np.sqrt(np.einsum("ijk,ijk->ij", d, d))
+    same = h == 0
+    # each body is on the same position as itself
+    same[np.arange(h.shape[0]), np.arange(rows.start, rows.stop)] = False
+    same_pairs = [(rows.start + i, j) for i, j in zip(*np.nonzero(same))
+                  if rows.start + i < j]
+    h[h == 0] = np.inf
+    f = scale * a[rows, None] * a[None, :] / h ** 3
+    return np.einsum("ij,ijk->ik", f, d), same_pairs
+
+
+def implicit_forces(index, bodies, name, scale, a):
+    """
+    returns the forces of all pairs of the bodies (in the arrays),
+    the force on the body i from j is scale.a[i].a[j].(p[i] - p[j])/r^3.
+    """
+    pos = arrays.pos[index]
+    if settings.workers:
+        return parallel_implicit_forces(pos, bodies, name, scale, a)
+    forces = np.zeros_like(pos)
+    if settings.backend == "numba":
+        if kernels.pairs(pos, np.ascontiguousarray(a), scale, forces):
+            for i, j in coincident_pairs(pos):
+                warn_same_pos(bodies[i], bodies[j], name)
+        return forces
+    for rows in row_blocks(len(index)):
+        forces[rows], same_pairs = row_forces(pos, a, scale, rows)
+        for i, j in same_pairs:
+            warn_same_pos(bodies[i], bodies[j], name)
+    return forces
+
+
+def coincident_pairs(pos):
+    """ returns the pairs (i, j), i < j, of the rows of pos which are equal """
+    _, inverse, counts = np.unique(pos, axis=0, return_inverse=True,
+                                   return_counts=True)
+    result = []
+    for group in np.flatnonzero(counts > 1):
+        same = np.flatnonzero(inverse.ravel() == group).tolist()
+        result += [(i, j) for a, i in enumerate(same) for j in same[a + 1:]]
+    return result
+
+
+def set_implicit_gravity():
+    """ sets the gravity forces between all gravitational masses """
+    index, bodies, xs, ys, zs, ms = gather("gravitational", "m")
+    if len(bodies) < 2:
+        return
+    if arrays.enabled:
+        m = arrays.m[index]
+        arrays.frc[index] += implicit_forces(index, bodies, gv, -G, m)
+        return
+    for i, m1 in enumerate(bodies):
+        for j in range(i + 1, len(bodies)):
+            dx, dy, dz = xs[i] - xs[j], ys[i] - ys[j], zs[i] - zs[j]
+            d = hypot(dx, dy, dz)
+            if d == 0:
+                warn_same_pos(m1, bodies[j], gv)
+                continue
+            f = G * ms[i] * ms[j] / d ** 3
+            m1.update_forces(-f * dx, -f * dy, -f * dz)
+            bodies[j].update_forces(f * dx, f * dy, f * dz)
+
+
+def set_implicit_electricity():
+    """ sets the electricity forces between all electrical masses """
+    index, bodies, xs, ys, zs, qs = gather("electrical", "q")
+    if len(bodies) < 2:
+        return
+    if arrays.enabled:
+        q = arrays.q[index]
+        arrays.frc[index] += implicit_forces(index, bodies, el, k, q)
+        return
+    for i, m1 in enumerate(bodies):
+        for j in range(i + 1, len(bodies)):
+            dx, dy, dz = xs[i] - xs[j], ys[i] - ys[j], zs[i] - zs[j]
+            d = hypot(dx, dy, dz)
+            if d == 0:
+                warn_same_pos(m1, bodies[j], el)
+                continue
+            f = k * qs[i] * qs[j] / d ** 3
+            m1.update_forces(f * dx, f * dy, f * dz)
+            bodies[j].update_forces(-f * dx, -f * dy, -f * dz)
+
+
+def set_implicit_collisions():
+    """ collides all of the solid masses which hit each other """
+    index, bodies, xs, ys, zs, rs = gather("solid", "r")
+    if len(bodies) < 2:
+        return
+    if arrays.enabled:
+        pos = arrays.pos[index]
+        r = arrays.r[index]
+        for rows in row_blocks(len(index)):
+            d = pos[rows, None, :] - pos[None, :, :]
+            h = np.sqrt(np.einsum("ijk,ijk->ij", d, d))
+            hit = h <= r[rows, None] + r[None, :]
+            for i, j in zip(*np.nonzero(hit)):
+                if rows.start + i < j:
+                    collision.collide(bodies[rows.start + i], bodies[j])
+        return
+    for i, m1 in enumerate(bodies):
+        for j in range(i + 1, len(bodies)):
+            d = hypot(xs[i] - xs[j], ys[i] - ys[j], zs[i] - zs[j])
+            if d <= rs[i] + rs[j]:
+                collision.collide(m1, bodies[j])
+
+
+# barnes-hut gravity
+
+class octree:
+    """
+    a node of the octree used by the barnes-hut gravity.
+    the node is a cube with the center of x, y, z and the size of
+    2 * half and keeps the total mass (m) and the center of mass
+    (mx, my, mz) of the bodies inside it.
+    leaves have a list of bodies (indexes) and no children,
+    the other nodes have 8 children (some of them may be None).
+    """
+    __slots__ = ("x", "y", "z", "half", "m", "mx", "my", "mz",
+                 "bodies", "children")
+    # leaves smaller than this won't be divided, so bodies on the
+    # same position don't make the tree infinitely deep.
+    min_half = 1e-9
+
+    def __init__(self, x, y, z, half):
+        self.x = x
+        self.y = y
+        self.z = z
+        self.half = half
+        self.m = self.mx = self.my = self.mz = 0
+        self.bodies = []
+        self.children = None
+
+    def child(self, x, y, z):
+        """ returns the child which contains x, y, z (creates it if needed) """
+        i = (x >= self.x) | (y >= self.y) << 1 | (z >= self.z) << 2
+        node = self.children[i]
+        if node is None:
+            h = self.half / 2
+            node = self.children[i] = octree(
+                self.x + (h if i & 1 else -h),
+                self.y + (h if i & 2 else -h),
+                self.z + (h if i & 4 else -h), h)
+        return node
+
+    def insert(self, i, xs, ys, zs):
+        """ inserts the body i (xs[i], ys[i], zs[i]) into the tree """
+        node = self
+        while node.children is not None:
+            node = node.child(xs[i], ys[i], zs[i])
+        node.bodies.append(i)
+        if len(node.bodies) > 1 and node.half > self.min_half:
+            bodies = node.bodies
+            node.bodies = None
+            node.children = [None] * 8
+            for j in bodies:
+                node.insert(j, xs, ys, zs)
+
+    def weigh(self, xs, ys, zs, ms):
+        """ calculates the mass and the center of mass of all nodes """
+        m = mx = my = mz = 0
+        if self.children is None:
+            for i in self.bodies:
+                m += ms[i]
+                mx += ms[i] * xs[i]
+                my += ms[i] * ys[i]
+                mz += ms[i] * zs[i]
+        else:
+            for node in self.children:
+                if node is not None:
+                    node.weigh(xs, ys, zs, ms)
+                    m += node.m
+                    mx += node.m * node.mx
+                    my += node.m * node.my
+                    mz += node.m * node.mz
+        self.m = m
+        if m:
+            self.mx, self.my, self.mz = mx / m, my / m, mz / m
+
+    @classmethod
+    def build(cls, xs, ys, zs, ms):
+        """ returns the root of the octree of the bodies """
+        x0, x1 = min(xs), max(xs)
+        y0, y1 = min(ys), max(ys)
+        z0, z1 = min(zs), max(zs)
+        half = max(x1 - x0, y1 - y0, z1 - z0) / 2 or 1
+        root = cls((x0 + x1) / 2, (y0 + y1) / 2, (z0 + z1) / 2, half)
+        for i in range(len(xs)):
+            root.insert(i, xs, ys, zs)
+        root.weigh(xs, ys, zs, ms)
+        return root
+
+    def gravity(self, i, xs, ys, zs, ms, theta, bodies):
+        """
+        returns the gravity force applied to the body i by all of the
+        bodies in the tree, using the center of mass of the far nodes.
+        """
+        x, y, z, m = xs[i], ys[i], zs[i], ms[i]
+        theta2 = theta * theta
+        fx = fy = fz = 0
+        stack = [self]
+        while stack:
+            node = stack.pop()
+            if node.children is None:
+                for j in node.bodies:
+                    if j == i:
+                        continue
+                    dx, dy, dz = xs[j] - x, ys[j] - y, zs[j] - z
+                    d = hypot(dx, dy, dz)
+                    if d == 0:
+                        warn_same_pos(bodies[i], bodies[j], gv)
+                        continue
+                    f = G * m * ms[j] / d ** 3
+                    fx += f * dx
+                    fy += f * dy
+                    fz += f * dz
+                continue
+            dx, dy, dz = node.mx - x, node.my - y, node.mz - z
+            d2 = dx * dx + dy * dy + dz * dz
+            if 4 * node.half * node.half < theta2 * d2:
+                # the node is far enough to be seen as one body
+                f = G * m * node.m / (d2 * d2 ** .5)
+                fx += f * dx
+                fy += f * dy
+                fz += f * dz
+            else:
+                stack.extend(c for c in node.children if c is not None)
+        return fx, fy, fz
+
+
+def gather(flag, *names):
+    """
+    returns the masses having the flag (like "solid") and lists of
+    their x, y, z and the other attributes in names.
+    the first item is their index in the arrays (None without arrays).
+    """
+    names = ("x", "y", "z") + names
+    if arrays.enabled:
+        index = np.flatnonzero(getattr(arrays, flag)[:arrays.n])
+        bodies = [arrays.owners[i] for i in index]
+        pos = arrays.pos[index]
+        values = pos.T.tolist() + [getattr(arrays, name)[index].tolist()
+                                   for name in names[3:]]
+        return (index, bodies, *values)
+    bodies = [m for m in mass_lis if getattr(m, flag)]
+    values = [[getattr(m, name) for m in bodies] for name in names]
+    return (None, bodies, *values)
+
+
+def set_barnes_hut_gravity():
+    """
+    sets the gravity forces of all of the gravitational masses
+    using an octree instead of gravity objects for each pair.
+    """
+    index, bodies, xs, ys, zs, ms = gather("gravitational", "m")
+    if len(bodies) < 2:
+        return
+    root = octree.build(xs, ys, zs, ms)
+    forces = [root.gravity(i, xs, ys, zs, ms, settings.theta, bodies)
+              for i in range(len(bodies))]
+    if arrays.enabled:
+        arrays.frc[index] += forces
+    else:
+        for m, (fx, fy, fz) in zip(bodies, forces):
+            m.update_forces(fx, fy, fz)
+
+
+# collision broad phase
+
+# the offsets of half of the neighbouring cells; with the cell itself
+# they make each pair of neighbouring cells be checked just once.
+half_shell = [(i, j, l) for i in (-1, 0, 1) for j in (-1, 0, 1)
+              for l in (-1, 0, 1) if (i, j, l) > (0, 0, 0)]
+
+
+def cell_pairs(xs, ys, zs, size):
+    """
+    yields the pairs of indexes (i, j) of the points which are in the
+    same or neighbouring cells of a uniform grid with cells of the
+    given size. all of the points closer than size are among them.
+    """
+    cells = {}
+    for i, key in enumerate(zip((int(x // size) for x in xs),
+                                (int(y // size) for y in ys),
+                                (int(z // size) for z in zs))):
+        cells.setdefault(key, []).append(i)
+    for (cx, cy, cz), cell in cells.items():
+        for a, i in enumerate(cell):
+            for j in cell[a + 1:]:
+                yield i, j
+        for ox, oy, oz in half_shell:
+            other = cells.get((cx + ox, cy + oy, cz + oz))
+            if other is not None:
+                for i in cell:
+                    for j in other:
+                        yield i, j
+
+
+def set_grid_collisions():
+    """
+    collides the solid masses which hit each other, using a uniform
+    grid to find the candidates instead of collision objects for each pair.
+    """
+    _, bodies, xs, ys, zs, rs = gather("solid", "r")
+    if len(bodies) < 2:
+        return
+    size = 2 * max(rs)
+    for i, j in cell_pairs(xs, ys, zs, size):
+        if hypot(xs[i] - xs[j], ys[i] - ys[j], zs[i] - zs[j]) <= rs[i] + rs[j]:
+            collision.collide(bodies[i], bodies[j])
+
+
+# electricity neighbour lists
+
+class neighbour_list:
+    """
+    the verlet neighbour list of the electrical masses.
+    pairs (i, j) are the indexes of the masses closer than radius
+    (cutoff + skin) when it was built and x0, y0, z0 are the positions
+    of the masses then. the list stays valid until a mass moves more
+    than skin / 2 or the electrical masses change.
+    """
+
+    def __init__(self):
+        self.bodies = []
+        self.radius = None
+        self.i = self.j = []
+        self.x0 = self.y0 = self.z0 = []
+
+    def outdated(self, bodies, xs, ys, zs):
+        """ returns True if the list should be built again """
+        if self.radius != settings.cutoff + settings.skin:
+            return True
+        if len(bodies) != len(self.bodies) or any(
+                a is not b for a, b in zip(bodies, self.bodies)):
+            return True
+        limit2 = (settings.skin / 2) ** 2
+        for x, y, z, x0, y0, z0 in zip(xs, ys, zs, self.x0, self.y0, self.z0):
+            if (x - x0) ** 2 + (y - y0) ** 2 + (z - z0) ** 2 > limit2:
+                return True
+        return False
+
+    def build(self, bodies, xs, ys, zs):
+        """ builds the list using a grid with cells as big as the radius """
+        radius = settings.cutoff + settings.skin
+        self.i, self.j = [], []
+        for i, j in cell_pairs(xs, ys, zs, radius):
+            if hypot(xs[i] - xs[j], ys[i] - ys[j], zs[i] - zs[j]) < radius:
+                self.i.append(i)
+                self.j.append(j)
+        if arrays.enabled:
+            self.i = np.array(self.i, dtype=np.intp)
+            self.j = np.array(self.j, dtype=np.intp)
+        self.bodies = bodies
+        self.radius = radius
+        self.x0, self.y0, self.z0 = xs, ys, zs
+
+
+electricity_neighbours = neighbour_list()
+
+
+def set_neighbour_electricity():
+    """
+    sets the electricity forces between the electrical masses closer
+    than settings.cutoff using the verlet neighbour list.
+    the force on m1 is k.q1.q2.(p1 - p2)/r^3 just like electricity.set_force.
+    """
+    index, bodies, xs, ys, zs, qs = gather("electrical", "q")
+    if len(bodies) < 2:
+        return
+    nl = electricity_neighbours
+    if nl.outdated(bodies, xs, ys, zs):
+        nl.build(bodies, xs, ys, zs)
+    if arrays.enabled:
+        if not len(nl.i):
+            return
+        i1, i2 = index[nl.i], index[nl.j]
+        d = arrays.pos[i1] - arrays.pos[i2]
+        h = np.sqrt(np.einsum("ij,ij->i", d, d))
+        same = h == 0
+        for a in np.flatnonzero(same):
+            warn_same_pos(bodies[nl.i[a]], bodies[nl.j[a]], el)
+        h[same] = 1
+        f = k * arrays.q[i1] * arrays.q[i2] / h ** 3
+        f[same | (h >= settings.cutoff)] = 0
+        scatter_forces(i1, i2, d * f[:, None])
+        return
+    forces = [[0, 0, 0] for _ in bodies]
+    cutoff = settings.cutoff
+    for i, j in zip(nl.i, nl.j):
+        dx, dy, dz = xs[i] - xs[j], ys[i] - ys[j], zs[i] - zs[j]
+        h = hypot(dx, dy, dz)
+        if h >= cutoff:
+            continue
+        if h == 0:
+            warn_same_pos(bodies[i], bodies[j], el)
+            continue
+        f = k * qs[i] * qs[j] / h ** 3
+        fi, fj = forces[i], forces[j]
+        fi[0] += f * dx
+        fi[1] += f * dy
+        fi[2] += f * dz
+        fj[0] -= f * dx
+        fj[1] -= f * dy
+        fj[2] -= f * dz
+    for m, (fx, fy, fz) in zip(bodies, forces):
+        m.update_forces(fx, fy, fz)
+
+
+# solvers of the automated forces which are not calculated by pairs
+pair_solvers = {
+    (gravity, implicit): set_implicit_gravity,
+    (electricity, implicit): set_implicit_electricity,
+    (collision, implicit): set_implicit_collisions,
+    (gravity, barnes_hut): set_barnes_hut_gravity,
+    (collision, grid): set_grid_collisions,
+    (electricity, neighbours): set_neighbour_electricity,
+}
+
+
+# the numba backend
+# these are the loop versions of the numpy solvers. they are compiled
+# by numba when the numba backend is chosen (see use_backend) and they
+# calculate exactly the same things as the numpy solvers.
+
+def spring_kernel(pos, frc, i1, i2, k, nl):
+    """
+    set_spring_forces as a loop.
+    returns the number of springs skipped because of zero length.
+    """
+    same = 0
+    for s in range(len(i1)):
+        a = i1[s]
+        b = i2[s]
+        dx = pos[a, 0] - pos[b, 0]
+        dy = pos[a, 1] - pos[b, 1]
+        dz = pos[a, 2] - pos[b, 2]
+        h = (dx * dx + dy * dy + dz * dz) ** .5
+        if h == 0:
+            same += 1
+            continue
+        f = -k[s] * (h - nl[s]) / h
+        frc[a, 0] += f * dx
+        frc[a, 1] += f * dy
+        frc[a, 2] += f * dz
+        frc[b, 0] -= f * dx
+        frc[b, 1] -= f * dy
+        frc[b, 2] -= f * dz
+    return same
+
+
+def pairs_kernel(pos, a, scale, forces):
+    """
+    implicit_forces as a loop.
+    returns the number of pairs skipped because of being on the same position.
+    """
+    same = 0
+    n = len(a)
+    for i in range(n):
+        for j in range(i + 1, n):
+            dx = pos[i, 0] - pos[j, 0]
+            dy = pos[i, 1] - pos[j, 1]
+            dz = pos[i, 2] - pos[j, 2]
+            h = (dx * dx + dy * dy + dz * dz) ** .5
+            if h == 0:
+                same += 1
+                continue
+            f = scale * a[i] * a[j] / (h * h * h)
+            forces[i, 0] += f * dx
+            forces[i, 1] += f * dy
+            forces[i, 2] += f * dz
+            forces[j, 0] -= f * dx
+            forces[j, 1] -= f * dy
+            forces[j, 2] -= f * dz
+    return same
+
+
+def move_kernel(pos, vel, frc, m, moveable, ax, ay, az, dt):
+    """ move_arrays as a loop (without checking the limits) """
+    for i in range(len(m)):
+        if moveable[i]:
+            vel[i, 0] += (frc[i, 0] / m[i] + ax) * dt
+            vel[i, 1] += (frc[i, 1] / m[i] + ay) * dt
+            vel[i, 2] += (frc[i, 2] / m[i] + az) * dt
+            pos[i, 0] += vel[i, 0] * dt
+            pos[i, 1] += vel[i, 1] * dt
+            pos[i, 2] += vel[i, 2] * dt
+
+
+def spring_forces_kernel(pos, i1, i2, k, nl, forces, start, stop):
+    """
+    the forces of the springs start to stop (the force on m1) as a loop,
+    like parallel_spring_forces. the springs with zero length get no force.
+    """
+    for s in range(start, stop):
+        a = i1[s]
+        b = i2[s]
+        dx = pos[a, 0] - pos[b, 0]
+        dy = pos[a, 1] - pos[b, 1]
+        dz = pos[a, 2] - pos[b, 2]
+        h = (dx * dx + dy * dy + dz * dz) ** .5
+        if h == 0:
+            forces[s, 0] = forces[s, 1] = forces[s, 2] = 0
+            continue
+        f = -k[s] * (h - nl[s]) / h
+        forces[s, 0] = f * dx
+        forces[s, 1] = f * dy
+        forces[s, 2] = f * dz
+
+
+def rows_kernel(pos, a, scale, forces, start, stop):
+    """
+    the rows start to stop of implicit_forces as a loop (each row adds up
+    the forces from all of the other bodies, like parallel_implicit_forces).
+    returns the number of pairs skipped because of being on the same position.
+    """
+    same = 0
+    for i in range(start, stop):
+        fx = fy = fz = 0.
+        for j in range(len(a)):
+            if j == i:
+                continue
+            dx = pos[i, 0] - pos[j, 0]
+            dy = pos[i, 1] - pos[j, 1]
+            dz = pos[i, 2] - pos[j, 2]
+            h = (dx * dx + dy * dy + dz * dz) ** .5
+            if h == 0:
+                same += 1
+                continue
+            f = scale * a[i] * a[j] / (h * h * h)
+            fx += f * dx
+            fy += f * dy
+            fz += f * dz
+        forces[i, 0] = fx
+        forces[i, 1] = fy
+        forces[i, 2] = fz
+    return same
+
+
+class kernels:
+    """ the compiled kernels of the numba backend """
+    spring = None
+    pairs = None
+    move = None
+    spring_forces = None
+    rows = None
+
+
+backends = ("pure", "numpy", "numba")
+
+
+def compile_kernels():
+    """
+    compiles the kernels using numba.
+    returns False if numba is not installed.
+    """
+    if kernels.move is not None:
+        return True
+    try:
+        import numba
+    except ImportError:
+        return False
+    kernels.spring = numba.njit(cache=True)(spring_kernel)
+    kernels.pairs = numba.njit(cache=True)(pairs_kernel)
+    kernels.move = numba.njit(cache=True)(move_kernel)
+    # these ones run in the threads of the parallel solvers
+    kernels.spring_forces = numba.njit(cache=True, nogil=True)(spring_forces_kernel)
+    kernels.rows = numba.njit(cache=True, nogil=True)(rows_kernel)
+    return True
+
+
+def use_backend(name):
+    """
+    chooses the backend of the engine.
+    pure: the classic mass objects, each force object sets its own force.
+    numpy: the array backed world (see use_arrays) and the numpy solvers.
+    numba: the array backed world and the solvers compiled by numba.
+        if numba is not installed it falls back to numpy with a warning.
+    the masses that already exist are moved to the new backend.
+    returns the name of the backend chosen.
+    """
+    assert name in backends, ValueError(
+        f"backend should be one of {backends} not {name!r}")
+    if name == "numba" and not compile_kernels():
+        warnings.warn(Warning("numba is not installed, using numpy instead."))
+        name = "numpy"
+    use_arrays(name != "pure")
+    settings.backend = name
+    return name
+
+
+# parallel force evaluation
+
+class pool:
+    """ the thread pool of the parallel solvers (see settings.workers) """
+    executor = None
+    workers = 0
+    ignored = set()  # the forces warned about by check_workers
+
+
+# the forces set by threads in the array backed world, with their modes
+parallel_solvers = {(spring, pairs), (gravity, implicit), (electricity, implicit)}
+
+
+def check_workers(f):
+    """
+    warns (once for each force, mode and backend) that settings.workers
+    is ignored by the force class f, which is set by one thread.
+    """
+    mode = getattr(settings, f.__name__, pairs)
+    if arrays.enabled and (f, mode) in parallel_solvers:
+        return
+    if mode == pairs and not f.object_list:
+        return  # there is nothing to set
+    key = f, mode, settings.backend
+    if key in pool.ignored:
+        return
+    pool.ignored.add(key)
+    if arrays.enabled and hasattr(settings, f.__name__):
+        where = "%s = %s" % (f.__name__, mode)
+    else:
+        where = "the %s backend" % settings.backend
+    warn(Exceptions.WorkersIgnored(
+        "settings.workers is ignored by the %s forces with %s, they are set by one thread" % (f.name, where)))
+
+
+def parallel_map(func, items):
+    """
+    returns [func(item) for item in items], calculated by
+    settings.workers threads. the order of the results is kept.
+    """
+    if settings.workers <= 1:
+        return [func(item) for item in items]
+    if pool.workers != settings.workers:
+        if pool.executor is not None:
+            pool.executor.shutdown()
+        pool.executor = ThreadPoolExecutor(settings.workers)
+        pool.workers = settings.workers
+    return list(pool.executor.map(func, items))
+
+
+def chunks(n):
+    """
+    splits range(n) into slices for the parallel solvers.
+    they only depend on n, so the results don't depend on workers.
+    """
+    return list(row_blocks(n, max(1, min(2 ** 20 // max(n, 1), -(-n // 64)))))
+
+
+def parallel_spring_forces():
+    """
+    set_spring_forces using threads. each chunk of springs calculates
+    the force of each spring, then they are all added to the masses at once.
+    """
+    e = spring_edges
+    pos = arrays.pos
+    forces = np.empty((len(e.i1), 3))
+
+    def chunk(rows):
+        if settings.backend == "numba":
+            kernels.spring_forces(pos, e.i1, e.i2, e.k, e.nl, forces,
+                                  rows.start, rows.stop)
+            return
+        d = pos[e.i1[rows]] - pos[e.i2[rows]]
+        h = np.sqrt(np.einsum("ij,ij->i", d, d))
+        same = h == 0
+        h[same] = 1
+        f = -e.k[rows] * (h - e.nl[rows]) / h
+        f[same] = 0
+        forces[rows] = d * f[:, None]
+
+    parallel_map(chunk, chunks(len(e.i1)))
+    d = pos[e.i1] - pos[e.i2]
+    for i in np.flatnonzero(~d.any(axis=1)):
+        s = spring_lis[i]
+        warn_same_pos(s.m1, s.m2, s.name)
+    scatter_forces(e.i1, e.i2, forces)
+
+
+def parallel_implicit_forces(pos, bodies, name, scale, a):
+    """
+    implicit_forces using threads. each chunk of rows adds up the
+    forces on its bodies from all of the other bodies.
+    """
+    forces = np.zeros_like(pos)
+    a = np.ascontiguousarray(a)
+
+    def chunk(rows):
+        if settings.backend == "numba":
+            same = kernels.rows(pos, a, scale, forces, rows.start, rows.stop)
+            return [None] if same else []
+        forces[rows], same_pairs = row_forces(pos, a, scale, rows)
+        return same_pairs
+
+    same_pairs = sum(parallel_map(chunk, chunks(len(a))), [])
+    if same_pairs:
+        for i, j in coincident_pairs(pos):
+            warn_same_pos(bodies[i], bodies[j], name)
+    return forces
+
+
+# snapshots
+
+class snapshot:
+    """
+    the positions of all masses and springs at the end of one update.
+    it is never changed after being taken so other threads (like the
+    network server) can read it without locks while the simulation goes on.
+    masses is a read-only buffer of x,y,z,x,y,z,... floats in the order
+    of mass_lis and springs is the same for x1,y1,z1,x2,y2,z2 of spring_lis.
+    """
+    __slots__ = ("frame", "time", "masses", "springs")
+
+    def __init__(self, frame, time, masses, springs):
+        self.frame = frame
+        self.time = time
+        self.masses = masses
+        self.springs = springs
+
+
+class mass_order:
+    """ the indexes of mass_lis in the arrays, built again when they change """
+    version = -1
+    count = -1
+    index = None
+
+
+def mass_indexes():
+    """
+    returns the indexes of the masses of mass_lis in the arrays (in the
+    array backed world), e.g. arrays.pos[mass_indexes()] are the positions
+    in the order of mass_lis.
+    """
+    if mass_order.version != arrays.version or mass_order.count != len(mass_lis):
+        mass_order.index = np.array([m._i for m in mass_lis], dtype=np.intp)
+        mass_order.version = arrays.version
+        mass_order.count = len(mass_lis)
+    return mass_order.index
+
+
+def take_snapshot():
+    """ returns a snapshot of the current positions """
+    if arrays.enabled:
+        if spring_edges.outdated():
+            compile_springs()
+        pos = arrays.pos
+        masses = pos[mass_indexes()]
+        springs = np.concatenate((pos[spring_edges.i1], pos[spring_edges.i2]), axis=1)
+        masses.flags.writeable = False
+        springs.flags.writeable = False
+    else:
+        masses = array.array('d', [v for m in mass_lis for v in (m.x, m.y, m.z)])
+        springs = array.array('d', [v for s in spring_lis for v in
+                                    (s.m1.x, s.m1.y, s.m1.z, s.m2.x, s.m2.y, s.m2.z)])
+        masses = memoryview(masses.tobytes()).cast('d')
+        springs = memoryview(springs.tobytes()).cast('d')
+    return snapshot(simulation.steps, simulation.time, masses, springs)
+
+
+# saving and loading
+
+# a state is a directory of .npy files (which can be memory mapped) and a
+# meta.json file:
+# masses.npy is a structured array of the attributes of mass_lis.
+# springs.npy is a structured array of spring_lis, m1 and m2 being the
+#   indexes of the masses in mass_lis.
+# gravity.npy, electricity.npy, collision.npy are the indexes of m1 and m2
+#   of each force object (n*2) and air_resistance.npy is the indexes of m1.
+# meta.json has dt, acceleration, simulation and settings.
+
+state_version = 1
+mass_dtype = [(name, float) for name in ("x", "y", "z", "vx", "vy", "vz",
+                                         "fx", "fy", "fz", "m", "r", "q")]
+mass_dtype += [(name, bool) for name in mass_arrays.flags]
+mass_dtype += [("color", "u1", (3,)), ("visible", bool)]
+spring_dtype = [("m1", "i8"), ("m2", "i8"), ("k", float), ("nl", float),
+                ("color", "u1", (3,)), ("visible", bool)]
+pair_forces = {"gravity": gravity, "electricity": electricity, "collision": collision}
+
+
+def save_state(path):
+    """
+    saves the state of the world (all masses, springs and force objects)
+    into the directory path, which is created if it doesn't exist.
+    """
+    if np is None:
+        raise ImportError("saving states needs numpy")
+    compact_forces()
+    os.makedirs(path, exist_ok=True)
+    index = {id(m): i for i, m in enumerate(mass_lis)}
+    masses = np.zeros(len(mass_lis), dtype=mass_dtype)
+    names = masses.dtype.names
+    if arrays.enabled:
+        order = mass_indexes()
+        for i, name in enumerate(("x", "y", "z")):
+            masses[name] = arrays.pos[order, i]
+            masses["v" + name] = arrays.vel[order, i]
+            masses["f" + name] = arrays.frc[order, i]
+        for name in mass_arrays.scalars + mass_arrays.flags:
+            masses[name] = getattr(arrays, name)[order]
+        names = ("color", "visible")
+    for name in names:
+        masses[name] = [getattr(m, name) for m in mass_lis]
+    np.save(os.path.join(path, "masses.npy"), masses)
+    springs = np.zeros(len(spring_lis), dtype=spring_dtype)
+    springs["m1"] = [index[id(s.m1)] for s in spring_lis]
+    springs["m2"] = [index[id(s.m2)] for s in spring_lis]
+    for name in ("k", "nl", "color", "visible"):
+        springs[name] = [getattr(s, name) for s in spring_lis]
+    np.save(os.path.join(path, "springs.npy"), springs)
+    for name, f in pair_forces.items():
+        pairs_index = np.array([(index[id(o.m1)], index[id(o.m2)]) for o in f.object_list],
+                               dtype=np.int64).reshape(-1, 2)
+        np.save(os.path.join(path, name + ".npy"), pairs_index)
+    np.save(os.path.join(path, "air_resistance.npy"),
+            np.array([index[id(o.m1)] for o in air_resistance_lis], dtype=np.int64))
+    meta = {
+        "version": state_version,
+        "dt": dt,
+        "acceleration": [acceleration.x, acceleration.y, acceleration.z],
+        "simulation": {name: getattr(simulation, name) for name in ("steps", "time", "staggered", "last_dt")},
+        "settings": {name: value for name, value in vars(settings).items()
+                     if not name.startswith("_") and name != "backend"},
+    }
+    with open(os.path.join(path, "meta.json"), "w") as file:
+        json.dump(meta, file, indent=4)
+
+
+def load_state(path, mmap=True):
+    """
+    loads a state saved by save_state into the (empty) world.
+    the masses, springs and force objects are created without calling
+    their constructors and without create_all_automated_forces, so
+    initialize won't be called by mainloop, step and simulate.
+    if mmap is True the files are memory mapped instead of being read.
+    if the array backed world is enabled the masses are copied into the
+    arrays at once.
+    """
+    if np is None:
+        raise ImportError("loading states needs numpy")
+    global dt
+    compact_forces()
+    if mass_lis or spring_lis or any(f.object_list for f in pair_forces.values()) or air_resistance_lis:
+        raise ValueError("states can only be loaded into an empty world")
+    with open(os.path.join(path, "meta.json")) as file:
+        meta = json.load(file)
+    if meta["version"] != state_version:
+        raise ValueError("unknown state version %r" % meta["version"])
+    mode = 'r' if mmap else None
+
+    def load(name):
+        return np.load(os.path.join(path, name + ".npy"), mmap_mode=mode)
+    masses = load("masses")
+    n = len(masses)
+    colors = [tuple(color) for color in masses["color"].tolist()]
+    visible = masses["visible"].tolist()
+    if arrays.enabled:
+        arrays.allocate(max(arrays.capacity, n))
+        for i, name in enumerate(("x", "y", "z")):
+            arrays.pos[:n, i] = masses[name]
+            arrays.vel[:n, i] = masses["v" + name]
+            arrays.frc[:n, i] = masses["f" + name]
+        for name in mass_arrays.scalars + mass_arrays.flags:
+            getattr(arrays, name)[:n] = masses[name]
+        new = []
+        for i in range(n):
+            m = object.__new__(array_mass)
+            m._i = i
+            m.color = colors[i]
+            m.visible = visible[i]
+            new.append(m)
+        arrays.owners = list(new)
+        arrays.n = n
+        arrays.version += 1
+    else:
+        columns = [(name, masses[name].tolist()) for name in masses.dtype.names
+                   if name not in ("color", "visible")]
+        new = []
+        for i in range(n):
+            m = object.__new__(mass)
+            for name, values in columns:
+                setattr(m, name, values[i])
+            m.color = colors[i]
+            m.visible = visible[i]
+            new.append(m)
+    mass_lis.extend(new)
+    springs = load("springs")
+    m1s = springs["m1"].tolist()
+    m2s = springs["m2"].tolist()
+    ks = springs["k"].tolist()
+    nls = springs["nl"].tolist()
+    colors = [tuple(color) for color in springs["color"].tolist()]
+    visible = springs["visible"].tolist()
+    for i in range(len(springs)):
+        s = object.__new__(spring)
+        s.m1 = new[m1s[i]]
+        s.m2 = new[m2s[i]]
+        s.k = ks[i]
+        s.nl = nls[i]
+        s.color = colors[i]
+        s.visible = visible[i]
+        s.link()
+        spring_lis.append(s)
+    spring_edges.dirty = True
+    for name, f in pair_forces.items():
+        for i1, i2 in load(name).tolist():
+            o = object.__new__(f)
+            o.m1 = new[i1]
+            o.m2 = new[i2]
+            o.link()
+            f.object_list.append(o)
+    for i in load("air_resistance").tolist():
+        o = object.__new__(air_resistance)
+        o.m1 = new[i]
+        o.m2 = None
+        o.link()
+        air_resistance_lis.append(o)
+    dt = meta["dt"]
+    acceleration.x, acceleration.y, acceleration.z = meta["acceleration"]
+    for name, value in meta["simulation"].items():
+        setattr(simulation, name, value)
+    for name, value in meta["settings"].items():
+        setattr(settings, name, value)
+    simulation.initialized = True
+
+
 def initialize():
     create_all_automated_forces()
+    simulation.initialized = True
+
+
+def adaptive_dt():
+    """
+    returns the dt for the next update according to the current speeds,
+    the forces of the last update and the springs (see settings.adaptive).
+    """
+    tolerance = settings.tolerance
+    if arrays.enabled:
+        n = arrays.n
+        moveable = arrays.moveable[:n]
+        if not moveable.any():
+            return settings.dt_max
+        vel = arrays.vel[:n][moveable]
+        acc = accelerations_arrays()[moveable]
+        v = np.sqrt(np.einsum("ij,ij->i", vel, vel).max())
+        a = np.sqrt(np.einsum("ij,ij->i", acc, acc).max())
+        r = arrays.r[:n].min()
+        if spring_edges.outdated():
+            spring_edges.compile()
+        e = spring_edges
+        w2 = (e.k * (1 / arrays.m[e.i1] + 1 / arrays.m[e.i2])).max() if len(e.k) else 0
+    else:
+        movers = [m for m in mass_lis if m.moveable]
+        if not movers:
+            return settings.dt_max
+        v = max(m.v() for m in movers)
+        a = max(hypot(*m.accelerations()) for m in movers)
+        r = min(m.r for m in mass_lis)
+        # the angular frequency of a spring is (k / reduced mass) ^ 0.5
+        w2 = max((s.k * (1 / s.m1.m + 1 / s.m2.m) for s in spring_lis), default=0)
+    new = settings.dt_max
+    if v:
+        new = min(new, tolerance * r / v)
+    if a:
+        new = min(new, (tolerance * r / a) ** .5)
+    if w2:
+        new = min(new, tolerance / w2 ** .5)
+    return max(settings.dt_min, float(new))
+
+
+# validation
+
+def examples(indexes, most=5):
+    """ returns a few of the indexes as a string for the warnings """
+    indexes = list(indexes)
+    text = ", ".join(map(str, indexes[:most]))
+    return text + (", ..." if len(indexes) > most else "")
+
+
+def validate():
+    """
+    checks the speed and position limits of all moveable masses and finds
+    the masses (being solid, gravitational or electrical) and springs at
+    the same position, all at once. raises one warning for each kind of
+    problem found and returns the number of problems of each kind.
+    """
+    if arrays.enabled:
+        order = mass_indexes()
+        pos = arrays.pos[order]
+        vel = arrays.vel[order]
+        moveable = arrays.moveable[order]
+        low = (limit.MIN.x, limit.MIN.y, limit.MIN.z)
+        high = (limit.MAX.x, limit.MAX.y, limit.MAX.z)
+        fast = np.flatnonzero(moveable & (np.einsum("ij,ij->i", vel, vel) >= limit.MAX.v ** 2)).tolist()
+        far = np.flatnonzero(moveable & ~((low < pos) & (pos < high)).all(axis=1)).tolist()
+        interacting = np.flatnonzero((arrays.solid | arrays.gravitational | arrays.electrical)[order]).tolist()
+        same = [(interacting[i], interacting[j]) for i, j in coincident_pairs(pos[interacting])]
+        if spring_edges.outdated():
+            compile_springs()
+        ends = arrays.pos[spring_edges.i1] == arrays.pos[spring_edges.i2]
+        springs = np.flatnonzero(ends.all(axis=1)).tolist()
+    else:
+        fast = [i for i, m in enumerate(mass_lis) if m.moveable and m.v() >= limit.MAX.v]
+        far = [i for i, m in enumerate(mass_lis) if m.moveable and not (
+            limit.MIN.x < m.x < limit.MAX.x and limit.MIN.y < m.y < limit.MAX.y and
+            limit.MIN.z < m.z < limit.MAX.z)]
+        groups = {}
+        for i, m in enumerate(mass_lis):
+            if m.solid or m.gravitational or m.electrical:
+                groups.setdefault((m.x, m.y, m.z), []).append(i)
+        same = [(i, j) for group in groups.values() for a, i in enumerate(group) for j in group[a + 1:]]
+        springs = [i for i, s in enumerate(spring_lis)
+                   if (s.m1.x, s.m1.y, s.m1.z) == (s.m2.x, s.m2.y, s.m2.z)]
+    if fast:
+        warn(Exceptions.FasterThanSpeedLimitException(
+            f"{len(fast)} masses (indexes {examples(fast)} in mass_lis) can't go faster than {limit.MAX.v}"))
+    if far:
+        warn(Exceptions.FurtherThanPositionLimitException(
+            f"{len(far)} masses (indexes {examples(far)} in mass_lis) can't be placed out of the position limits"))
+    if same:
+        warn(Exceptions.SamePosition(
+            f"{len(same)} pairs of masses (indexes {examples(same)} in mass_lis) are at the same position"))
+    if springs:
+        warn(Exceptions.SamePosition(
+            f"{len(springs)} springs (indexes {examples(springs)} in spring_lis) have both masses at the same position"))
+    return {"speed": len(fast), "position": len(far), "same position": len(same), "springs": len(springs)}
+
+
+def profile_phases(*phases):
+    """ calls the phases of update, recording their time in stats """
+    for phase in phases:
+        start = perf_counter()
+        phase()
+        name = phase.__name__
+        stats.phases[name] = stats.phases.get(name, 0) + perf_counter() - start
+    stats.updates += 1
 
 
 def update():
-    empty_all_forces()
-    reflect_all()
-    set_all_forces()
-    move_all()
+    global dt
+    if settings.profiling:
+        start = perf_counter()
+    if settings.adaptive:
+        dt = adaptive_dt()
+    if settings.profiling:
+        stats.phases["adaptive_dt"] = stats.phases.get("adaptive_dt", 0) + perf_counter() - start
+        profile_phases(empty_all_forces, reflect_all, collide_all, set_all_forces, move_all)
+    else:
+        empty_all_forces()
+        reflect_all()
+        collide_all()
+        set_all_forces()
+        move_all()
+    simulation.steps += 1
+    simulation.time += dt
+    if settings.validation == strict or (
+            settings.validation == sampled and simulation.steps % settings.validate_every == 0):
+        validate()
+    for hook in update_hooks:
+        hook()
+
+
+def step(n=1):
+    """
+    runs n updates in a tight loop without displaying anything.
+    initialize is called first if it hasn't been called yet.
+    """
+    if not simulation.initialized:
+        initialize()
+    for _ in range(n):
+        update()
+
+
+def simulate(steps, callback=None, *args, callback_every=1):
+    """
+    runs steps updates without displaying anything (and without
+    importing pygame) and calls callback(*args) every callback_every
+    updates. returns the number of updates done.
+    """
+    assert isinstance(steps, int), TypeError("steps should be of type 'int'.")
+    assert callable(callback) or callback is None, TypeError(
+        "callback should be callable.")
+    assert isinstance(callback_every, int) and callback_every > 0, ValueError(
+        "callback_every should be a positive 'int'.")
+    if callback is None:
+        step(steps)
+        return steps
+    done = 0
+    while done + callback_every <= steps:
+        step(callback_every)
+        done += callback_every
+        callback(*args)
+    step(steps - done)
+    return steps
 
 
 def sort_by_z():
-    global mass_lis
-    mass_lis = list(sorted(mass_lis, key=lambda x: x.z, reverse=True))
+    # sorted in place, so the list (and its references) stays the same.
+    # the order of the last frame is almost sorted, which is fast to sort.
+    mass_lis.sort(key=lambda x: x.z, reverse=True)
+    # the caches holding the order of mass_lis are outdated
+    mass_order.version = -1
+    render_cache.dirty = True
 
 
 def show_all_masses(win_xy, win_zy):
@@ -858,10 +3118,150 @@ def show_all_springs(win_xy, win_zy):
 
 
 def show_all(win_xy, win_zy):
+    if settings.renderer == batched:
+        show_all_batched(win_xy, win_zy)
+        return
     show_all_masses(win_xy, win_zy)
     show_all_springs(win_xy, win_zy)
 
 
+# the batched renderer
+
+class looks:
+    """
+    the appearance of masses and springs as arrays, for draw_batched.
+    r, color (n*3), bound and visible are those of the masses and
+    m1, m2 (indexes of the masses), spring_color and spring_visible
+    are those of the springs.
+    """
+
+    def __init__(self, r, color, bound, visible, m1, m2, spring_color, spring_visible):
+        self.r = np.asarray(r, dtype=float)
+        self.color = np.asarray(color, dtype=float).reshape(-1, 3)
+        self.bound = np.asarray(bound, dtype=bool)
+        self.visible = np.asarray(visible, dtype=bool)
+        self.m1 = np.asarray(m1, dtype=np.intp)
+        self.m2 = np.asarray(m2, dtype=np.intp)
+        self.spring_color = np.asarray(spring_color, dtype=np.uint8).reshape(-1, 3)
+        self.spring_visible = np.asarray(spring_visible, dtype=bool)
+
+
+def world_looks():
+    """ returns the looks of mass_lis and spring_lis """
+    index = {id(m): i for i, m in enumerate(mass_lis)}
+    return looks([m.r for m in mass_lis], [m.color for m in mass_lis],
+                 [m.bound for m in mass_lis], [m.visible for m in mass_lis],
+                 [index[id(s.m1)] for s in spring_lis], [index[id(s.m2)] for s in spring_lis],
+                 [s.color for s in spring_lis], [s.visible for s in spring_lis])
+
+
+class render_cache:
+    """
+    the looks of the world used by show_all_batched and the depth order
+    of the last frame. it is built again when the lists of the masses
+    or the springs are changed (see registry.changes), or when dirty is True.
+    """
+    dirty = True
+    changes = None
+    looks = None
+    order = None
+
+
+def depth_order(z, order=None):
+    """
+    returns the indexes of z from the furthest to the nearest.
+    order is the order of the last frame, which is almost sorted, and
+    sorting it again with a stable sort (timsort) is almost linear.
+    """
+    if order is None or len(order) != len(z):
+        order = np.arange(len(z))
+    return order[np.argsort(-z[order], kind="stable")]
+
+
+def shaded(color, bound, z):
+    """ show_color of all masses """
+    shade = np.where(bound, (WIND + z) / (2 * WIND), 1)
+    return np.abs(color * shade[:, None]).astype(int)
+
+
+def draw_segments(win, p1, p2, colors, longest=32):
+    """
+    draws the lines from the points p1 to p2 (k*2 arrays of ints) with
+    colors (k*3) on win. the lines shorter than longest pixels are drawn
+    by setting the pixels along them all at once, the longer ones (which
+    have too many pixels for that) one by one with pygame.draw.line.
+    """
+    d = p2 - p1
+    steps = np.abs(d).max(axis=1)
+    long = steps > longest
+    if long.any():
+        line = pygame.draw.line
+        for color, start, end in zip(colors[long].tolist(), p1[long].tolist(), p2[long].tolist()):
+            line(win, color, start, end)
+        short = ~long
+        p1, d, steps, colors = p1[short], d[short], steps[short], colors[short]
+    counts = steps + 1
+    line = np.repeat(np.arange(len(p1)), counts)
+    t = np.arange(counts.sum()) - np.repeat(np.cumsum(counts) - counts, counts)
+    t = t / np.maximum(steps, 1)[line]
+    x = np.rint(p1[line, 0] + d[line, 0] * t).astype(np.intp)
+    y = np.rint(p1[line, 1] + d[line, 1] * t).astype(np.intp)
+    w, h = win.get_size()
+    inside = (x >= 0) & (x < w) & (y >= 0) & (y < h)
+    pixels = pygame.surfarray.pixels3d(win)
+    pixels[x[inside], y[inside]] = colors[line[inside]]
+    del pixels  # unlocking the surface
+
+
+def draw_batched(win_xy, win_zy, pos, looks, order=None):
+    """
+    draws the masses and springs at the positions pos (n*3, in the order
+    of looks) like show_all, and returns the depth order of the masses
+    which can be passed as order in the next frame.
+    """
+    n = min(len(pos), len(looks.r))
+    pos = pos[:n]
+    order = depth_order(pos[:, 2], order)
+    x = (position.x + pos[:, 0]).astype(int)
+    y = (position.y - pos[:, 1]).astype(int)
+    z = (position.z + pos[:, 2]).astype(int)
+    colors = shaded(looks.color[:n], looks.bound[:n], pos[:, 2]).tolist()
+    xy = np.stack((x, y), axis=1)
+    zy = np.stack((z, y), axis=1)
+    xy_list = xy.tolist()
+    zy_list = zy.tolist()
+    r = looks.r.tolist()
+    circle = pygame.draw.circle
+    for i in order[looks.visible[:n][order]].tolist():
+        circle(win_xy, colors[i], xy_list[i], r[i])
+        circle(win_zy, colors[i], zy_list[i], r[i])
+    drawn = looks.spring_visible & (looks.m1 < n) & (looks.m2 < n)
+    m1 = looks.m1[drawn]
+    m2 = looks.m2[drawn]
+    if len(m1):
+        spring_colors = looks.spring_color[drawn]
+        draw_segments(win_xy, xy[m1], xy[m2], spring_colors)
+        draw_segments(win_zy, zy[m1], zy[m2], spring_colors)
+    return order
+
+
+def show_all_batched(win_xy, win_zy):
+    """ show_all using draw_batched """
+    if np is None:
+        raise ImportError("the batched renderer needs numpy")
+    changes = mass_lis.changes, spring_lis.changes, arrays.version
+    if render_cache.dirty or render_cache.changes != changes:
+        render_cache.looks = world_looks()
+        render_cache.changes = changes
+        render_cache.order = None
+        render_cache.dirty = False
+    if arrays.enabled:
+        pos = arrays.pos[mass_indexes()]
+    else:
+        pos = np.array([(m.x, m.y, m.z) for m in mass_lis], dtype=float).reshape(-1, 3)
+    render_cache.order = draw_batched(win_xy, win_zy, pos, render_cache.looks, render_cache.order)
+
+
 def display(DISPLAYSURF, win_xy, win_zy):
     DISPLAYSURF.fill((0, 0, 0))
     win_xy.fill((0, 0, 0))
@@ -881,34 +3281,39 @@ def mainloop(speed=2, FPS=0, frame=None, *args, displaying=True):
         "frame should be callable.")
     assert isinstance(displaying, bool), TypeError(
         "displaying value can be either True or False")
-    if displaying:
-        DISPLAYSURF = pygame.display.set_mode((WINW * 2 + 1, WINH))
-        win_xy = pygame.surface.Surface((WINW, WINH))
-        win_zy = pygame.surface.Surface((WINW, WINH))
+    if not simulation.initialized:
+        initialize()
+    if not displaying:
+        # there is nothing to check between the updates
+        while True:
+            update()
+            if frame is not None:
+                frame(*args)
+    DISPLAYSURF = pygame.display.set_mode((WINW * 2 + 1, WINH))
+    win_xy = pygame.surface.Surface((WINW, WINH))
+    win_zy = pygame.surface.Surface((WINW, WINH))
     frame_number = 0
     frames_passing_speed = 1
     updating = True
-    initialize()
     while True:
-        if displaying:
-            frame_number += frames_passing_speed
-            for e in pygame.event.get():
-                if e.type == pygame.QUIT:
+        frame_number += frames_passing_speed
+        for e in pygame.event.get():
+            if e.type == pygame.QUIT:
+                pygame.quit()
+                return 0
+            elif e.type == pygame.KEYDOWN:
+                if e.key == pygame.K_SPACE:
+                    updating = not updating
+                elif e.key == pygame.K_ESCAPE:
                     pygame.quit()
                     return 0
-                elif e.type == pygame.KEYDOWN:
-                    if e.key == pygame.K_SPACE:
-                        updating = not updating
-                    elif e.key == pygame.K_ESCAPE:
-                        pygame.quit()
-                        return 0
-                elif e.type == pygame.MOUSEBUTTONDOWN:
-                    updating = not updating
-            if FPS != 0:
-                pygame.time.Clock().tick(FPS)
-            if frame_number % speed == 0:
-                display(DISPLAYSURF, win_xy, win_zy)
-                pygame.display.update()
+            elif e.type == pygame.MOUSEBUTTONDOWN:
+                updating = not updating
+        if FPS != 0:
+            pygame.time.Clock().tick(FPS)
+        if frame_number % speed == 0:
+            display(DISPLAYSURF, win_xy, win_zy)
+            pygame.display.update()
         if updating:
             update()
             if frame is not None:
@@ -18,7 +18,12 @@ the default host is localhost (obviously!) and the default port is
 foundations of the whole massspring library.
 """
 
+import array
+import asyncio
+import collections
+import json
 import socket
+import struct
 import sys
 import threading
 import types
@@ -36,6 +41,23 @@ exit_commands = [b'exit', b'quit']
 default_host = "127.0.0.1"  # localhost
 default_port = 7783  # fun fact: ord("M") == 77 && ord("S") == 83; (MassSpring)
 buffsize = 256
+# binary frames (see the binary encoders)
+binary_magic = b"MS"
+binary_mass = b'm'
+binary_spring = b's'
+binary_header = struct.Struct("<2sccQI")  # magic, kind, dtype, frame, count
+binary_dtypes = (b'f', b'd')  # float32, float64
+# delta streams (see delta_stream)
+delta_topology = b't'
+delta_key = b'k'
+delta_changes = b'd'
+delta_int = b'i'  # the dtype of the quantized positions (int32)
+delta_range = (-2 ** 31, 2 ** 31 - 1)  # the quantized positions that fit in int32
+# pushed frames (see start_async_server_mainloop)
+frame_header = struct.Struct("!I")  # length of the frame
+default_interval = 1 / 30
+close_timeout = 1  # seconds to wait for a connection to close before dropping it
+send_buffer = 64 * 1024  # bytes the socket of a client keeps (SO_SNDBUF)
 server = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
 
 
@@ -139,6 +161,374 @@ def decode_mass_spring_poses(response: bytes) -> list:
     return mass_lis, spring_lis
 
 
+# binary encode/decode functions
+
+# the text format above is simple but it is slow and large because each
+# float is written with str() and parsed with float(). the binary format
+# sends the same positions as packed little-endian floats.
+# each frame is a header followed by the positions:
+# the header (binary_header) is 16 bytes:
+#   magic: b"MS"
+#   kind: b'm' for masses or b's' for springs
+#   dtype: b'f' for float32 or b'd' for float64
+#   frame: the frame number (unsigned 64 bit)
+#   count: the number of masses or springs (unsigned 32 bit)
+# the positions are count * 3 floats for masses: x,y,z,x,y,z,...
+# and count * 6 floats for springs: x1,y1,z1,x2,y2,z2,...
+
+def binary_frame(kind: bytes, positions, frame: int = 0, dtype: bytes = b'd'):
+    """
+    returns the header and the payload of a binary frame.
+    positions is either an iterable of floats or an object supporting the
+    buffer protocol (like massspring.arrays.pos[:massspring.arrays.n]).
+    if it is a C-contiguous buffer of dtype floats it is not copied,
+    the payload is just a memoryview of it.
+    """
+    assert kind in (binary_mass, binary_spring), ValueError("'kind' should be binary_mass or binary_spring")
+    assert dtype in binary_dtypes, ValueError("'dtype' should be one of %s" % (binary_dtypes,))
+    per_item = 3 if kind == binary_mass else 6
+    try:
+        payload = memoryview(positions)
+    except TypeError:
+        payload = None
+    if (payload is None or payload.format != dtype.decode() or
+            not payload.c_contiguous or sys.byteorder != "little"):
+        if payload is not None:
+            # tobytes copies the values in order, even if not contiguous
+            positions = memoryview(payload.tobytes()).cast(payload.format)
+        values = array.array(dtype.decode(), positions)
+        if sys.byteorder != "little":
+            values.byteswap()
+        payload = memoryview(values)
+    payload = payload.cast('B')
+    count = len(payload) // (per_item * struct.calcsize(dtype.decode()))
+    header = binary_header.pack(binary_magic, kind, dtype, frame, count)
+    return header, payload
+
+
+def encode_mass_poses_binary(mass_lis: list, frame: int = 0, dtype: bytes = b'd') -> bytes:
+    """ encode_mass_poses using the binary format """
+    positions = [v for m in mass_lis for v in (m.x, m.y, m.z)]
+    return b''.join(binary_frame(binary_mass, positions, frame, dtype))
+
+
+def encode_spring_poses_binary(spring_lis: list, frame: int = 0, dtype: bytes = b'd') -> bytes:
+    """ encode_spring_poses using the binary format """
+    positions = [v for s in spring_lis for v in
+                 (s.m1.x, s.m1.y, s.m1.z, s.m2.x, s.m2.y, s.m2.z)]
+    return b''.join(binary_frame(binary_spring, positions, frame, dtype))
+
+
+def decode_binary_header(response: bytes) -> tuple:
+    """ returns kind, dtype, frame and count of a binary frame """
+    magic, kind, dtype, frame, count = binary_header.unpack_from(response)
+    if magic != binary_magic:
+        raise ValueError("the response is not a binary frame")
+    return kind, dtype, frame, count
+
+
+def decode_binary_values(response: bytes) -> tuple:
+    """
+    returns the kind and the frame number of a binary frame and
+    its positions as a flat array.array of floats.
+    """
+    kind, dtype, frame, count = decode_binary_header(response)
+    values = array.array(dtype.decode())
+    size = count * (3 if kind == binary_mass else 6) * values.itemsize
+    start = binary_header.size
+    values.frombytes(response[start:start + size])
+    if sys.byteorder != "little":
+        values.byteswap()
+    return kind, frame, values
+
+
+def decode_mass_poses_binary(response: bytes) -> tuple:
+    """
+    gets a binary frame of masses and returns its frame number
+    and a list of all positions of masses included in it.
+    """
+    kind, frame, values = decode_binary_values(response)
+    if kind != binary_mass:
+        raise ValueError("the response is not a frame of masses")
+    return frame, [list(values[i:i + 3]) for i in range(0, len(values), 3)]
+
+
+def decode_spring_poses_binary(response: bytes) -> tuple:
+    """
+    gets a binary frame of springs and returns its frame number
+    and a list of all positions of springs included in it.
+    """
+    kind, frame, values = decode_binary_values(response)
+    if kind != binary_spring:
+        raise ValueError("the response is not a frame of springs")
+    return frame, [[list(values[i:i + 3]), list(values[i + 3:i + 6])]
+                   for i in range(0, len(values), 6)]
+
+
+def encode_stats(massspring: types.ModuleType) -> bytes:
+    """
+    returns massspring.stats (see settings.profiling) as json, e.g. for
+    the 'information' dictionary: {b"stats": lambda: encode_stats(m)}
+    """
+    return json.dumps(massspring.stats_dict()).encode()
+
+
+# delta streams
+
+# a delta stream is a stateful stream for one client which doesn't send
+# what the client already knows. it uses the binary header with these kinds:
+# topology (b't'): sent first and whenever masses or springs are added
+#   or removed. the payload is the precision (float64), the number
+#   of springs (uint32) and the indexes of m1 and m2 of each spring in the
+#   mass order of the stream (uint32).
+#   count is the number of masses, so the springs are never sent again;
+#   the client finds their positions from the positions of the masses.
+#   the stream keeps the order of the masses it had when it sent the
+#   topology, so reordering mass_lis (like sort_by_z) doesn't change the
+#   indexes the client knows.
+# key (b'k'): all of the positions, quantized (divided by the precision
+#   and rounded) as int32. sent after each topology frame.
+#   if a quantized position doesn't fit in int32 the key frame is sent
+#   with the dtype b'd' instead and has the positions themselves (float64);
+#   the next frames are key frames too until all of them fit again.
+# changes (b'd'): only the masses which have moved at least threshold
+#   (in quantized units) since they were last sent. the payload is the
+#   count indexes (uint32) followed by their count * 3 positions (int32).
+
+def _packed(typecode: str, values) -> bytes:
+    """ returns the values as little-endian packed bytes """
+    values = array.array(typecode, values)
+    if sys.byteorder != "little":
+        values.byteswap()
+    return values.tobytes()
+
+
+def _unpacked(typecode: str, data) -> array.array:
+    """ the reverse of _packed """
+    values = array.array(typecode)
+    values.frombytes(data)
+    if sys.byteorder != "little":
+        values.byteswap()
+    return values
+
+
+class delta_stream:
+    """
+    the stream of the positions of masses and springs for one client.
+    next_frame returns the bytes that should be sent to it each time.
+    precision is the size of the quantization of positions.
+    threshold is the number of quantization steps a mass should move
+    before it is sent again.
+    """
+
+    def __init__(self, mass_lis: list, spring_lis: list, precision: float = .01, threshold: int = 1):
+        assert precision > 0, ValueError("'precision' should be positive")
+        assert threshold >= 1, ValueError("'threshold' should be at least 1")
+        self.mass_lis = mass_lis
+        self.spring_lis = spring_lis
+        self.precision = precision
+        self.threshold = threshold
+        self.frame = 0
+        self.masses = None  # the masses in the order the client knows them
+        self.index = {}  # id of those masses: their index
+        # the springs the client knows and their ids. the streams keep the
+        # masses and springs themselves, so their ids can't be reused by new ones
+        self.springs = []
+        self.spring_ids = set()
+        self.sent = None  # the quantized positions the client knows
+
+    def reset(self):
+        """ makes the next frame a topology frame """
+        self.masses = None
+
+    def changed(self) -> bool:
+        """ returns True if masses or springs were added or removed since the topology frame """
+        if self.masses is None:
+            return True
+        if len(self.mass_lis) != len(self.masses) or len(self.spring_lis) != len(self.springs):
+            return True
+        index = self.index
+        springs = self.spring_ids
+        return (any(id(m) not in index for m in self.mass_lis) or
+                any(id(s) not in springs for s in self.spring_lis))
+
+    def quantized(self) -> list:
+        """ returns the quantized positions of all masses, flat """
+        p = self.precision
+        return [round(v / p) for m in self.masses for v in (m.x, m.y, m.z)]
+
+    def topology(self) -> bytes:
+        """ returns the topology frame, freezing the order of the masses """
+        self.masses = list(self.mass_lis)
+        self.index = index = {id(m): i for i, m in enumerate(self.masses)}
+        self.springs = list(self.spring_lis)
+        self.spring_ids = {id(s) for s in self.springs}
+        pairs = [index[id(m)] for s in self.spring_lis for m in (s.m1, s.m2)]
+        header = binary_header.pack(binary_magic, delta_topology, delta_int, self.frame, len(self.masses))
+        return header + struct.pack("<dI", self.precision, len(self.spring_lis)) + _packed('I', pairs)
+
+    def next_frame(self) -> bytes:
+        """ returns the next frame for the client """
+        self.frame += 1
+        topology = self.topology() if self.changed() else b''
+        count = len(self.masses)
+        positions = self.quantized()
+        low, high = delta_range
+        if positions and (min(positions) < low or max(positions) > high):
+            # too far for int32 at this precision
+            self.sent = None
+            key = binary_header.pack(binary_magic, delta_key, b'd', self.frame, count)
+            return topology + key + _packed('d', [v for m in self.masses for v in (m.x, m.y, m.z)])
+        if topology or self.sent is None:
+            self.sent = positions
+            key = binary_header.pack(binary_magic, delta_key, delta_int, self.frame, count)
+            return topology + key + _packed('i', positions)
+        sent = self.sent
+        threshold = self.threshold
+        changed = [i for i in range(count) if
+                   abs(positions[3 * i] - sent[3 * i]) >= threshold or
+                   abs(positions[3 * i + 1] - sent[3 * i + 1]) >= threshold or
+                   abs(positions[3 * i + 2] - sent[3 * i + 2]) >= threshold]
+        values = []
+        for i in changed:
+            sent[3 * i:3 * i + 3] = positions[3 * i:3 * i + 3]
+            values += positions[3 * i:3 * i + 3]
+        header = binary_header.pack(binary_magic, delta_changes, delta_int, self.frame, len(changed))
+        return header + _packed('I', changed) + _packed('i', values)
+
+
+class delta_decoder:
+    """
+    the client side of a delta stream.
+    feed it the frames and read mass_poses and spring_poses, which are
+    lists of positions like the ones decode_mass_poses and
+    decode_spring_poses return.
+    """
+
+    def __init__(self):
+        self.frame = 0
+        self.precision = 1
+        self.springs = []  # indexes of m1 and m2 of the springs
+        self.quantized = []
+        self.scale = 1  # the precision, or 1 if the key frame had the positions themselves
+
+    def feed(self, response: bytes) -> int:
+        """ applies all of the frames in the response, returns the last frame number """
+        view = memoryview(response)
+        while len(view):
+            kind, dtype, frame, count = decode_binary_header(view)
+            view = view[binary_header.size:]
+            if kind == delta_topology:
+                self.precision, springs = struct.unpack_from("<dI", view)
+                view = view[12:]
+                self.springs = _unpacked('I', view[:springs * 8])
+                view = view[springs * 8:]
+            elif kind == delta_key:
+                size = count * 3 * struct.calcsize(dtype.decode())
+                self.quantized = _unpacked(dtype.decode(), view[:size])
+                self.scale = self.precision if dtype == delta_int else 1
+                view = view[size:]
+            elif kind == delta_changes:
+                index = _unpacked('I', view[:count * 4])
+                values = _unpacked('i', view[count * 4:count * 16])
+                view = view[count * 16:]
+                for a, i in enumerate(index):
+                    self.quantized[3 * i:3 * i + 3] = values[3 * a:3 * a + 3]
+            else:
+                raise ValueError("unknown delta frame %r" % kind)
+            self.frame = frame
+        return self.frame
+
+    def mass_poses(self) -> list:
+        """ returns the positions of all masses """
+        p = self.scale
+        q = self.quantized
+        return [[q[i] * p, q[i + 1] * p, q[i + 2] * p] for i in range(0, len(q), 3)]
+
+    def spring_poses(self) -> list:
+        """ returns the positions of both ends of all springs """
+        poses = self.mass_poses()
+        s = self.springs
+        return [[poses[s[i]], poses[s[i + 1]]] for i in range(0, len(s), 2)]
+
+
+# snapshots
+
+# the masses are changed by the simulation thread while the server threads
+# read them, so reading mass_lis directly may give torn frames. instead a
+# snapshot_buffer takes a snapshot (massspring.take_snapshot) at the end of
+# each update and the server only reads the snapshots, which never change.
+# each snapshot is encoded once, no matter how many clients ask for it.
+
+class snapshot_buffer:
+    """
+    a ring buffer of the last size snapshots of the simulation.
+    attach adds it to massspring.update_hooks, so it takes a snapshot
+    every `every` updates.
+    mass_frame and spring_frame return the newest snapshot encoded in the
+    binary format and can be used as frame_maker or in 'information'.
+    """
+
+    def __init__(self, massspring: types.ModuleType, size: int = 4, every: int = 1, dtype: bytes = b'd'):
+        assert size >= 1, ValueError("'size' should be at least 1")
+        assert every >= 1, ValueError("'every' should be at least 1")
+        assert dtype in binary_dtypes, ValueError("'dtype' should be one of %s" % (binary_dtypes,))
+        self.massspring = massspring
+        self.every = every
+        self.dtype = dtype
+        self.snapshots = collections.deque(maxlen=size)
+        self.encoded = (None, {})  # the newest snapshot and its encodings
+
+    def attach(self):
+        """ starts taking snapshots, taking the first one now """
+        self.publish(force=True)
+        self.massspring.update_hooks.append(self.publish)
+
+    def detach(self):
+        """ stops taking snapshots """
+        self.massspring.update_hooks.remove(self.publish)
+
+    def publish(self, force: bool = False):
+        """ takes a snapshot (called by the simulation thread) """
+        if force or self.massspring.simulation.steps % self.every == 0:
+            self.snapshots.append(self.massspring.take_snapshot())
+
+    def latest(self):
+        """ returns the newest snapshot or None """
+        try:
+            return self.snapshots[-1]
+        except IndexError:
+            return None
+
+    def get(self, frame: int):
+        """ returns the snapshot of the frame if it is still in the buffer, else None """
+        for snap in list(self.snapshots):
+            if snap.frame == frame:
+                return snap
+        return None
+
+    def encode(self, kind: bytes) -> bytes:
+        """ returns the newest snapshot encoded as a binary frame of kind """
+        snap = self.latest()
+        if snap is None:
+            raise ValueError("no snapshot has been taken, call attach first")
+        # replaced as a whole, so readers never see a half updated cache
+        cached, frames = self.encoded
+        if cached is not snap:
+            frames = {}
+            self.encoded = (snap, frames)
+        if kind not in frames:
+            positions = snap.masses if kind == binary_mass else snap.springs
+            frames[kind] = b''.join(binary_frame(kind, positions, snap.frame, self.dtype))
+        return frames[kind]
+
+    def mass_frame(self) -> bytes:
+        return self.encode(binary_mass)
+
+    def spring_frame(self) -> bytes:
+        return self.encode(binary_spring)
+
+
 def analyse_request(request: bytes, information: typing.Mapping[bytes, typing.Callable], delimiter: bytes = b'|'):
     """
     analyse_request is just the default request analyser. we wont use this function in
@@ -162,7 +552,9 @@ def analyse_request(request: bytes, information: typing.Mapping[bytes, typing.Ca
             assert callable(func), TypeError("'information' values should be callable.")
             ans: bytes = func()
             assert isinstance(ans, bytes), ValueError("'information' values should return bytes object.")
-            ans = ans.strip()
+            if not ans.startswith(binary_magic):
+                # binary frames may start or end with whitespace bytes
+                ans = ans.strip()
             yield ans
         else:
             warnings.warn(Warning("the request %s is not in the 'information' dictionary" % req))
@@ -178,37 +570,93 @@ def analyse_request_wrapper(information: typing.Mapping[bytes, typing.Callable],
     return wrapped_request_analyser
 
 
-def send(soc: socket.socket, data: bytes):
-    """ sends data properly and safely """
+# framed transport
+
+# every message (in both directions) is a frame_header holding the length
+# of the message followed by the message itself. the header has a fixed
+# size, so the receiver always knows how many bytes it should wait for,
+# no matter how TCP splits or joins the messages.
+
+def send(soc: socket.socket, data, *more):
+    """
+    sends data (and the buffers in more, as one message) properly and safely.
+    the buffers are sent without joining them, e.g. send(soc, *binary_frame(...)).
+    """
     assert isinstance(soc, socket.socket), TypeError("'soc' should be socket.socket")
-    assert isinstance(data, bytes), TypeError("'data' should be bytes")
-    length = str(len(data)).encode()
-    soc.send(length)
-    return soc.send(data)
+    buffers = [memoryview(data).cast('B')] + [memoryview(b).cast('B') for b in more]
+    length = sum(len(b) for b in buffers)
+    buffers.insert(0, memoryview(frame_header.pack(length)))
+    if not hasattr(soc, "sendmsg"):
+        # windows
+        for b in buffers:
+            soc.sendall(b)
+        return length
+    while buffers:
+        sent = soc.sendmsg(buffers)
+        # dropping what has been sent and retrying the rest
+        while buffers and sent >= len(buffers[0]):
+            sent -= len(buffers.pop(0))
+        if buffers:
+            buffers[0] = buffers[0][sent:]
+    return length
+
+
+def recv_exactly(soc: socket.socket, view: memoryview) -> None:
+    """ fills the whole view with bytes received from soc """
+    while len(view):
+        received = soc.recv_into(view)
+        if not received:
+            raise ConnectionAbortedError("the connection was closed in the middle of a message")
+        view = view[received:]
+
+
+class receiver:
+    """
+    receives the messages of one socket into one buffer, which is reused
+    (and only allocated again when a bigger message comes).
+    the memoryview returned by recv is only valid until the next recv.
+    """
+
+    def __init__(self, soc: socket.socket, size: int = buffsize):
+        assert isinstance(soc, socket.socket), TypeError("'soc' should be socket.socket")
+        self.soc = soc
+        self.header = memoryview(bytearray(frame_header.size))
+        self.buffer = memoryview(bytearray(size))
+
+    def recv(self) -> memoryview:
+        """ receives one message """
+        recv_exactly(self.soc, self.header)
+        length, = frame_header.unpack(self.header)
+        if length > len(self.buffer):
+            self.buffer = memoryview(bytearray(max(length, 2 * len(self.buffer))))
+        view = self.buffer[:length]
+        recv_exactly(self.soc, view)
+        return view
 
 
-def recv(soc: socket.socket):
+def recv(soc: socket.socket) -> bytes:
     """ receives data properly and safely """
-    length = int(soc.recv(buffsize).decode())
-    return soc.recv(length)
+    header = bytearray(frame_header.size)
+    recv_exactly(soc, memoryview(header))
+    length, = frame_header.unpack(header)
+    data = bytearray(length)
+    recv_exactly(soc, memoryview(data))
+    return bytes(data)
 
 
 def handle_client(client_socket: socket.socket, addr: typing.Iterable, request_analyser: typing.Callable) -> None:
     """
     handles the client socket by receiving it's query
     and returning what it asked for in return.
-    it runs in an infinite loop and receives the request and sends TWO respones to them:
-    - the first one is the length of the actual response returned from
-    request_analyser with a newline character at the end of it
-    - the second one is the actual respone itself.
-    as far as I know they won't get mixed together so that the client can do a socket.recv
-    with 256 as buffersize and use the length to do another recv.
+    it runs in an infinite loop and receives the requests and sends the
+    responses returned from request_analyser to them, each one as a
+    message of the framed transport (see send and recv).
     """
+    requests = receiver(client_socket)
     try:
         while True:
-            # receiving the request asked by the client maxlength should be specified
-            # by client in a message with maxlength 256.
-            request = recv(client_socket)
+            # receiving the request asked by the client
+            request = bytes(requests.recv())
             # processing the received request
             data = request_analyser(request)
             for resp in data:
@@ -217,9 +665,9 @@ def handle_client(client_socket: socket.socket, addr: typing.Iterable, request_a
                     return
                 # sending the received data
                 send(client_socket, resp)
-    except BrokenPipeError:
-        # client closed the connection after receiving the whole response
-        print(f"[ERROR] connection with {addr[0]}:{addr[1]} closed unexpectedly: Broken Pipe.")
+    except ConnectionError as e:
+        # client closed the connection without sending an exit command
+        print(f"[ERROR] connection with {addr[0]}:{addr[1]} closed unexpectedly: {e}.")
 
 
 def handle_client_wrapper(request_analyser: typing.Callable) -> typing.Callable:
@@ -267,3 +715,132 @@ def start_server_mainloop(
         thread_list.append(client_handler_thread)
     sys.exit(0)
     # exiting and killing all threads, showing no mercy
+
+
+# asyncio server
+
+# the asyncio server doesn't wait for requests. it pushes a frame to every
+# client on a timer, from one event loop. each client has a queue of size
+# one, so a client that can't keep up only gets the newest frame and the
+# stale ones are dropped. each frame is sent as a frame_header followed by
+# the frame itself.
+
+def offer(queue: asyncio.Queue, item) -> None:
+    """ puts item in the queue, dropping the stale item if it is full """
+    if queue.full():
+        queue.get_nowait()
+    queue.put_nowait(item)
+
+
+async def push_frames(
+        reader: asyncio.StreamReader, writer: asyncio.StreamWriter,
+        queue: asyncio.Queue, stream: typing.Callable[[], bytes] = None) -> None:
+    """
+    sends every frame offered to the queue to the client until it disconnects.
+    if stream is given, the items of the queue are only ticks and the frame
+    is made by calling stream when the client is ready to receive it.
+    """
+    addr = writer.get_extra_info("peername")
+    # drain waits until the whole frame is given to the socket, and the
+    # socket only keeps a small buffer, so the frames made meanwhile wait
+    # in the queue, where the stale ones are dropped
+    writer.transport.set_write_buffer_limits(0)
+    sock = writer.get_extra_info("socket")
+    if sock is not None:
+        sock.setsockopt(socket.SOL_SOCKET, socket.SO_SNDBUF, send_buffer)
+    closed = asyncio.ensure_future(reader.read())  # the client doesn't send anything
+    try:
+        while not closed.done():
+            item = await queue.get()
+            frame = item if stream is None else stream()
+            writer.write(frame_header.pack(len(frame)))
+            writer.write(frame)
+            await writer.drain()
+    except (ConnectionError, BrokenPipeError):
+        print(f"[ERROR] connection with {addr[0]}:{addr[1]} closed unexpectedly.")
+    except asyncio.CancelledError:
+        # the server is stopping. a client which isn't reading would never
+        # take the rest of the buffer, so the connection is dropped at once
+        writer.transport.abort()
+        raise
+    finally:
+        closed.cancel()
+        writer.close()
+        try:
+            await asyncio.wait_for(writer.wait_closed(), close_timeout)
+        except (ConnectionError, BrokenPipeError, asyncio.TimeoutError):
+            writer.transport.abort()
+
+
+async def serve_frames(
+        thread: threading.Thread, frame_maker: typing.Callable[[], bytes],
+        stream_maker: typing.Callable[[], typing.Callable[[], bytes]],
+        host: str, port: int, interval: float) -> None:
+    """ the coroutine run by start_async_server_mainloop """
+    queues = set()
+    clients = set()  # the tasks pushing frames to the clients
+
+    async def client_connected(reader, writer):
+        addr = writer.get_extra_info("peername")
+        print("[INFO] Accepted connection from: %s:%d" % (addr[0], addr[1]))
+        queue = asyncio.Queue(1)
+        queues.add(queue)
+        clients.add(asyncio.current_task())
+        try:
+            await push_frames(reader, writer, queue, None if stream_maker is None else stream_maker())
+        except asyncio.CancelledError:
+            pass  # cancelled by the shutdown, the connection is closed
+        finally:
+            queues.discard(queue)
+            clients.discard(asyncio.current_task())
+
+    async_server = await asyncio.start_server(client_connected, host, port)
+    try:
+        while thread.is_alive():
+            await asyncio.sleep(interval)
+            if queues:
+                # encoded once and shared among all clients
+                frame = None if frame_maker is None else frame_maker()
+                for queue in queues:
+                    offer(queue, frame)
+    finally:
+        # no new clients, then the connected ones are closed (so they get EOF)
+        # and waited for before the loop is closed
+        async_server.close()
+        for task in clients:
+            task.cancel()
+        await asyncio.gather(*clients, return_exceptions=True)
+        await async_server.wait_closed()
+
+
+def start_async_server_mainloop(
+        massspring: types.ModuleType, massspring_mainloop_args: typing.Iterable, massspring_mainloop_kwargs: typing.Mapping[str, typing.Any],
+        frame_maker: typing.Callable[[], bytes] = None,
+        stream_maker: typing.Callable[[], typing.Callable[[], bytes]] = None,
+        host: str = None, port: int = None, interval: float = None):
+    """
+    runs massspring.mainloop in a thread and pushes frames to all of the
+    connected clients every interval seconds until it finishes.
+    frame_maker is called once per frame and the result is shared among all
+    clients, e.g. lambda: encode_mass_poses_binary(massspring.mass_lis).
+    stream_maker is called once per client instead and should return the
+    function making the frames of that client, e.g.
+    lambda: delta_stream(massspring.mass_lis, massspring.spring_lis).next_frame
+    """
+    assert (frame_maker is None) != (stream_maker is None), TypeError("exactly one of 'frame_maker' and 'stream_maker' should be given")
+    if host is None:
+        host = default_host
+    if port is None:
+        port = default_port
+    if interval is None:
+        interval = default_interval
+    massspring_mainloop_thread = threading.Thread(
+        target=massspring.mainloop, args=massspring_mainloop_args, kwargs=massspring_mainloop_kwargs)
+    massspring_mainloop_thread.daemon = True
+    massspring_mainloop_thread.start()
+    loop = asyncio.new_event_loop()
+    try:
+        loop.run_until_complete(serve_frames(
+            massspring_mainloop_thread, frame_maker, stream_maker, host, port, interval))
+    finally:
+        loop.close()
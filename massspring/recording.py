@@ -0,0 +1,435 @@
+#!/usr/bin/env python3
+# -- In the name of God --
+# Project: massspring (mass+spring)
+# File: recording.py
+# Author: Pooya Shams kolahi
+# Inspired by Saeed Sarkarati
+
+
+"""
+recording.py
+
+this file records the trajectories of the masses into a file while the
+simulation is running and reads them back afterwards, without keeping
+the whole run in memory.
+"""
+
+import array
+import bisect
+import importlib
+import json
+import mmap
+import struct
+import sys
+import types
+
+try:
+    import numpy as np
+except ImportError:  # the frames are array.array objects without numpy
+    np = None
+
+# Variables
+
+# a recording is two files:
+# the recording itself (e.g. "run.msr"):
+#   magic: b"MSR1"
+#   the length of the header (unsigned 32 bit) and the header, which is
+#   json holding the dtype, whether velocities are recorded, every, and
+#   the appearance of the world when the recording started:
+#   r, color, bound and visible of the masses and m1, m2 (indexes of the
+#   masses), color and visible of the springs.
+#   then the frames, appended one after another. each frame is a
+#   frame_header (step, time, number of masses) followed by the positions
+#   x,y,z,x,y,z,... and then (if recorded) the velocities in the same way.
+#   the masses are always in the order mass_lis had when the recording
+#   started, even if mass_lis is reordered (like sort_by_z) afterwards.
+#   masses created after that are not recorded and removed ones keep
+#   their last position.
+# the index (e.g. "run.msr.idx"): the offset of each frame in the
+#   recording (unsigned 64 bit), so any frame can be found without
+#   reading the ones before it.
+# everything is little-endian.
+magic = b"MSR1"
+length_header = struct.Struct("<I")
+frame_header = struct.Struct("<QdI")  # step, time, count
+offset = struct.Struct("<Q")
+dtypes = ('f', 'd')  # float32, float64
+index_suffix = ".idx"
+
+
+# functions
+
+def _values(typecode: str, values) -> bytes:
+    """ returns the floats as little-endian bytes of typecode """
+    values = array.array(typecode, values)
+    if sys.byteorder != "little":
+        values.byteswap()
+    return values.tobytes()
+
+
+def appearance(massspring: types.ModuleType, masses: list = None) -> dict:
+    """
+    returns the parts of the header describing how the world looks.
+    masses is the order of the masses (mass_lis by default); the springs
+    between masses which are not in it are left out.
+    """
+    if masses is None:
+        masses = massspring.mass_lis
+    index = {id(m): i for i, m in enumerate(masses)}
+    springs = [s for s in massspring.spring_lis if id(s.m1) in index and id(s.m2) in index]
+    return {
+        "masses": {
+            "r": [m.r for m in masses],
+            "color": [list(m.color) for m in masses],
+            "bound": [m.bound for m in masses],
+            "visible": [m.visible for m in masses],
+        },
+        "springs": {
+            "m1": [index[id(s.m1)] for s in springs],
+            "m2": [index[id(s.m2)] for s in springs],
+            "color": [list(s.color) for s in springs],
+            "visible": [s.visible for s in springs],
+        },
+    }
+
+
+# recorder
+
+class recorder:
+    """
+    records the positions (and velocities) of all masses every `every`
+    updates into the file path, using massspring.update_hooks.
+    the frames are kept in memory until chunk of them are collected and
+    then they are appended to the file at once.
+    it can be used as a context manager:
+
+    with recording.recorder("run.msr", every=10):
+        massspring.simulate(100000)
+    """
+
+    def __init__(self, path: str, every: int = 1, velocities: bool = True,
+                 chunk: int = 64, dtype: str = 'd', massspring: types.ModuleType = None):
+        assert every >= 1, ValueError("'every' should be at least 1")
+        assert chunk >= 1, ValueError("'chunk' should be at least 1")
+        assert dtype in dtypes, ValueError("'dtype' should be one of %s" % (dtypes,))
+        self.path = path
+        self.every = every
+        self.velocities = velocities
+        self.chunk = chunk
+        self.dtype = dtype
+        if massspring is None:
+            massspring = importlib.import_module("massspring.massspring")
+        self.massspring = massspring
+        self.file = None
+        self.index = None
+        self.position = 0  # the offset of the next frame
+        self.pending = []  # the frames waiting to be written
+        self.offsets = []  # and their offsets
+        self.masses = []  # the recorded masses, in the order of the header
+        # for the arrays: the version of arrays the indexes were found in,
+        # the rows of the masses still in the arrays and their indexes there,
+        # and the last positions and velocities of all of the masses
+        self.version = None
+        self.rows = self.indexes = None
+        self.positions = self.speeds = None
+
+    def __enter__(self):
+        self.start()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.stop()
+
+    def start(self):
+        """ writes the header and the current frame and starts recording """
+        self.masses = list(self.massspring.mass_lis)
+        self.version = None
+        self.positions = self.speeds = None
+        header = {"dtype": self.dtype, "velocities": self.velocities, "every": self.every}
+        header.update(appearance(self.massspring, self.masses))
+        header = json.dumps(header).encode()
+        self.file = open(self.path, "wb")
+        self.index = open(self.path + index_suffix, "wb")
+        self.file.write(magic + length_header.pack(len(header)) + header)
+        self.position = len(magic) + length_header.size + len(header)
+        self.add_frame()
+        self.massspring.update_hooks.append(self.record)
+
+    def stop(self):
+        """ stops recording and closes the files """
+        if self.record in self.massspring.update_hooks:
+            self.massspring.update_hooks.remove(self.record)
+        if self.file is not None:
+            self.flush()
+            self.file.close()
+            self.index.close()
+            self.file = self.index = None
+
+    def record(self):
+        """ records a frame every `every` updates (called after each update) """
+        if self.massspring.simulation.steps % self.every == 0:
+            self.add_frame()
+
+    def add_frame(self):
+        """ records the current frame """
+        ms = self.massspring
+        masses = self.masses
+        if ms.arrays.enabled:
+            arrays = ms.arrays
+            if arrays.version != self.version or self.positions is None:
+                self.find_indexes()
+            self.positions[self.rows] = arrays.pos[self.indexes]
+            parts = [self.positions.astype('<' + self.dtype).tobytes()]
+            if self.velocities:
+                self.speeds[self.rows] = arrays.vel[self.indexes]
+                parts.append(self.speeds.astype('<' + self.dtype).tobytes())
+        else:
+            parts = [_values(self.dtype, [v for m in masses for v in (m.x, m.y, m.z)])]
+            if self.velocities:
+                parts.append(_values(self.dtype, [v for m in masses for v in (m.vx, m.vy, m.vz)]))
+        data = frame_header.pack(ms.simulation.steps, ms.simulation.time, len(masses)) + b''.join(parts)
+        self.pending.append(data)
+        self.offsets.append(self.position)
+        self.position += len(data)
+        if len(self.pending) >= self.chunk:
+            self.flush()
+
+    def find_indexes(self):
+        """ finds the indexes of the recorded masses in the arrays (which change when one is removed) """
+        arrays = self.massspring.arrays
+        owners = arrays.owners
+        rows = [row for row, m in enumerate(self.masses)
+                if getattr(m, "_i", len(owners)) < len(owners) and owners[m._i] is m]
+        self.rows = np.array(rows, dtype=np.intp)
+        self.indexes = np.array([self.masses[row]._i for row in rows], dtype=np.intp)
+        self.version = arrays.version
+        if self.positions is None:
+            self.positions = np.zeros((len(self.masses), 3))
+            self.speeds = np.zeros((len(self.masses), 3))
+
+    def flush(self):
+        """ appends the pending frames to the file and their offsets to the index """
+        self.file.write(b''.join(self.pending))
+        self.file.flush()
+        # the index is written after the frames, so it never points to a missing frame
+        self.index.write(b''.join(offset.pack(o) for o in self.offsets))
+        self.index.flush()
+        self.pending = []
+        self.offsets = []
+
+
+# reader
+
+class frame:
+    """
+    one recorded frame.
+    step and time are simulation.steps and simulation.time of the frame.
+    positions and velocities (None if not recorded) are n*3 numpy arrays
+    (flat array.array objects of floats without numpy).
+    """
+    __slots__ = ("step", "time", "positions", "velocities")
+
+    def __init__(self, step, time, positions, velocities):
+        self.step = step
+        self.time = time
+        self.positions = positions
+        self.velocities = velocities
+
+
+class trajectory:
+    """
+    reads a recording made by recorder.
+    the file is memory mapped, so only the frames that are used are read
+    (and the numpy arrays of the frames are read-only views of it).
+    len(t) is the number of frames, t[i] is frame i and iterating over it
+    streams the frames in order.
+    header is the header of the recording (see appearance).
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        with open(path, "rb") as file:
+            self.data = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+        if self.data[:len(magic)] != magic:
+            raise ValueError("%s is not a massspring recording" % path)
+        length, = length_header.unpack_from(self.data, len(magic))
+        start = len(magic) + length_header.size
+        self.header = json.loads(bytes(self.data[start:start + length]))
+        self.dtype = self.header["dtype"]
+        self.velocities = self.header["velocities"]
+        self.offsets = array.array('Q')
+        with open(path + index_suffix, "rb") as file:
+            self.offsets.frombytes(file.read())
+        if sys.byteorder != "little":
+            self.offsets.byteswap()
+
+    def __len__(self):
+        return len(self.offsets)
+
+    def __getitem__(self, i: int) -> frame:
+        return self.read(self.offsets[i])
+
+    def __iter__(self):
+        for o in self.offsets:
+            yield self.read(o)
+
+    def close(self):
+        self.data.close()
+
+    def times(self) -> list:
+        """ returns the time of each frame (without reading the positions) """
+        return [frame_header.unpack_from(self.data, o)[1] for o in self.offsets]
+
+    def values(self, start: int, count: int):
+        """ returns count * 3 floats starting at the offset start """
+        size = count * 3 * struct.calcsize(self.dtype)
+        view = memoryview(self.data)[start:start + size]
+        if np is not None:
+            return np.frombuffer(view, dtype='<' + self.dtype).reshape(count, 3)
+        values = array.array(self.dtype)
+        values.frombytes(view)
+        if sys.byteorder != "little":
+            values.byteswap()
+        return values
+
+    def read(self, start: int) -> frame:
+        """ returns the frame at the offset start """
+        step, time, count = frame_header.unpack_from(self.data, start)
+        start += frame_header.size
+        positions = self.values(start, count)
+        velocities = None
+        if self.velocities:
+            velocities = self.values(start + count * 3 * struct.calcsize(self.dtype), count)
+        return frame(step, time, positions, velocities)
+
+
+# replay
+
+def points(positions) -> list:
+    """ returns the positions of a frame as a list of [x, y, z] """
+    if np is not None and isinstance(positions, np.ndarray):
+        return positions.tolist()
+    return [positions[i:i + 3].tolist() for i in range(0, len(positions), 3)]
+
+
+def show_frame(win_xy, win_zy, positions, header: dict, massspring: types.ModuleType, pygame: types.ModuleType):
+    """
+    draws the positions of a frame just like show_all draws the masses
+    and springs, using the appearance saved in the header.
+    """
+    ms = massspring
+    poses = points(positions)
+    masses = header["masses"]
+    springs = header["springs"]
+    n = min(len(poses), len(masses["r"]))
+    # the masses added after the recording started aren't drawn
+    for i in sorted(range(n), key=lambda i: poses[i][2], reverse=True):
+        if not masses["visible"][i]:
+            continue
+        x, y, z = poses[i]
+        color = masses["color"][i]
+        if masses["bound"][i]:
+            shade = (ms.WIND + z) / (2 * ms.WIND)
+            color = [int(abs(v * shade)) for v in color]
+        r = masses["r"][i]
+        pygame.draw.circle(win_xy, color, (int(ms.position.x + x), int(ms.position.y - y)), r)
+        pygame.draw.circle(win_zy, color, (int(ms.position.z + z), int(ms.position.y - y)), r)
+    for m1, m2, color, visible in zip(springs["m1"], springs["m2"], springs["color"], springs["visible"]):
+        if not visible or m1 >= n or m2 >= n:
+            continue
+        x1, y1, z1 = poses[m1]
+        x2, y2, z2 = poses[m2]
+        pygame.draw.line(win_xy, color, (int(ms.position.x + x1), int(ms.position.y - y1)),
+                         (int(ms.position.x + x2), int(ms.position.y - y2)))
+        pygame.draw.line(win_zy, color, (int(ms.position.z + z1), int(ms.position.y - y1)),
+                         (int(ms.position.z + z2), int(ms.position.y - y2)))
+
+
+def replay(path, speed: float = 1, FPS: int = 60, massspring: types.ModuleType = None):
+    """
+    shows a recording (a path or a trajectory) in the same window as
+    mainloop, without creating any masses or springs or updating anything.
+    it is drawn by the batched renderer if numpy is installed.
+    speed is the number of simulated seconds shown in each second.
+    keys:
+    space (or clicking): pause / play
+    left / right: one frame backward / forward
+    page up / page down: a tenth of the recording backward / forward
+    home / end: the first / last frame
+    up / down: twice / half the speed
+    escape: quit
+    """
+    assert speed > 0, ValueError("'speed' should be positive")
+    assert isinstance(FPS, int) and FPS > 0, TypeError("FPS should be a positive 'int'.")
+    pygame = importlib.import_module("pygame")
+    if massspring is None:
+        massspring = importlib.import_module("massspring.massspring")
+    ms = massspring
+    t = path if isinstance(path, trajectory) else trajectory(path)
+    times = t.times()
+    if not times:
+        raise ValueError("the recording has no frames")
+    last = len(times) - 1
+    batched = None
+    order = None
+    if np is not None:
+        # drawn by the batched renderer of massspring
+        masses = t.header["masses"]
+        springs = t.header["springs"]
+        batched = ms.looks(masses["r"], masses["color"], masses["bound"], masses["visible"],
+                           springs["m1"], springs["m2"], springs["color"], springs["visible"])
+    DISPLAYSURF = pygame.display.set_mode((ms.WINW * 2 + 1, ms.WINH))
+    win_xy = pygame.surface.Surface((ms.WINW, ms.WINH))
+    win_zy = pygame.surface.Surface((ms.WINW, ms.WINH))
+    clock = pygame.time.Clock()
+    playing = True
+    i = 0
+    current = times[0]
+    while True:
+        seek = None
+        for e in pygame.event.get():
+            if e.type == pygame.QUIT:
+                pygame.quit()
+                return 0
+            elif e.type == pygame.KEYDOWN:
+                if e.key == pygame.K_SPACE:
+                    playing = not playing
+                elif e.key == pygame.K_ESCAPE:
+                    pygame.quit()
+                    return 0
+                elif e.key == pygame.K_LEFT:
+                    seek = i - 1
+                elif e.key == pygame.K_RIGHT:
+                    seek = i + 1
+                elif e.key == pygame.K_PAGEUP:
+                    seek = i - len(times) // 10
+                elif e.key == pygame.K_PAGEDOWN:
+                    seek = i + len(times) // 10
+                elif e.key == pygame.K_HOME:
+                    seek = 0
+                elif e.key == pygame.K_END:
+                    seek = last
+                elif e.key == pygame.K_UP:
+                    speed *= 2
+                elif e.key == pygame.K_DOWN:
+                    speed /= 2
+            elif e.type == pygame.MOUSEBUTTONDOWN:
+                playing = not playing
+        passed = clock.tick(FPS) / 1000
+        if seek is not None:
+            i = min(max(seek, 0), last)
+            current = times[i]
+        elif playing and i < last:
+            current += passed * speed
+            i = min(bisect.bisect_right(times, current) - 1, last)
+        DISPLAYSURF.fill((0, 0, 0))
+        win_xy.fill((0, 0, 0))
+        win_zy.fill((0, 0, 0))
+        if batched is None:
+            show_frame(win_xy, win_zy, t[i].positions, t.header, ms, pygame)
+        else:
+            order = ms.draw_batched(win_xy, win_zy, t[i].positions, batched, order)
+        DISPLAYSURF.blit(win_xy, (0, 0))
+        DISPLAYSURF.blit(win_zy, (ms.WINW + 1, 0))
+        pygame.draw.line(DISPLAYSURF, (255, 0, 0), (ms.WINW, 0), (ms.WINW, ms.WINH))
+        pygame.display.update()
@@ -25,6 +25,10 @@ setup(
     install_requires=[
         "pygame",
     ],
+    extras_require={
+        "arrays": ["numpy"],
+        "numba": ["numpy", "numba"],
+    },
     classifiers=[
         "Development Status :: 5 - Production/Stable",
         "Intended Audience :: Developers",
@@ -0,0 +1,187 @@
+# -- In the name of God --
+# Project: massspring (mass+spring)
+# File: test_backends.py
+# Author: Pooya Shams kolahi
+# Inspired by Saeed Sarkarati
+
+"""
+the pure, numpy and numba backends should calculate the same things.
+each scene is built and run from a fresh massspring module with every
+backend, and the final positions and velocities are compared to the
+ones of the pure backend.
+
+run with: python -m pytest -q
+"""
+
+import importlib
+import random
+import sys
+import warnings
+
+import pytest
+
+pytest.importorskip("numpy")
+
+try:
+    import numba
+except ImportError:
+    numba = None
+
+import massspring  # noqa: F401 (the package, imported before the module)
+
+# Variables
+
+steps = 50
+tolerance = 1e-9  # relative to the size of the values
+backends = [
+    "numpy",
+    pytest.param("numba", marks=pytest.mark.skipif(numba is None, reason="numba is not installed")),
+]
+integrators = ("euler", "leapfrog", "verlet", "rk4")
+
+
+# scenes
+# each scene gets a fresh massspring module and builds a world.
+# they are deterministic, so every backend gets the same world.
+
+def springs(m):
+    """ a small cloth of springs hanging from its top row """
+    m.acceleration.y = -m.ge
+    size = 8
+    grid = [[m.mass(-100 + i * 25, 100 - j * 25, 0, r=1, solid=False, moveable=j != 0)
+             for j in range(size)] for i in range(size)]
+    for i in range(size):
+        for j in range(size):
+            if i + 1 < size:
+                m.spring(grid[i][j], grid[i + 1][j], k=500)
+            if j + 1 < size:
+                m.spring(grid[i][j], grid[i][j + 1], k=500, nl=20)
+
+
+def gravitational(m):
+    """ a cloud of gravitational masses """
+    rand = random.Random(0)
+    for _ in range(40):
+        m.mass(rand.uniform(-150, 150), rand.uniform(-150, 150), rand.uniform(-150, 150),
+               m=1e12, r=1, solid=False, gravitational=True)
+
+
+def charged(m):
+    """ charged masses, half positive and half negative """
+    rand = random.Random(1)
+    for i in range(40):
+        m.mass(rand.uniform(-150, 150), rand.uniform(-150, 150), rand.uniform(-150, 150),
+               vx=rand.uniform(-10, 10), vy=rand.uniform(-10, 10), vz=rand.uniform(-10, 10),
+               r=1, q=(1 if i % 2 else -1) * 1e-7, solid=False, electrical=True)
+
+
+def colliding(m):
+    """ solid masses flying into each other in pairs and bouncing in the box """
+    rand = random.Random(2)
+    for i in range(20):
+        y, z = rand.uniform(-200, 200), rand.uniform(-200, 200)
+        m.mass(-8, y, z, vx=100, r=5, m=1 + i % 3)
+        m.mass(8, y + rand.uniform(-3, 3), z, vx=-100, r=5)
+    for _ in range(20):
+        m.mass(rand.uniform(-240, 240), rand.uniform(-240, 240), rand.uniform(-240, 240),
+               vx=rand.uniform(-400, 400), vy=rand.uniform(-400, 400), vz=rand.uniform(-400, 400), r=3)
+
+
+def mixed(m):
+    """ springs, gravity, charges and collisions at once """
+    springs(m)
+    m.acceleration.y = 0
+    gravitational(m)
+    charged(m)
+    colliding(m)
+
+
+# running
+
+def run(scene, backend, **options):
+    """
+    builds the scene with the backend and the settings in options in a
+    fresh massspring module, runs it and returns the positions and velocities.
+    """
+    m = importlib.reload(sys.modules["massspring.massspring"])
+    with warnings.catch_warnings():
+        warnings.simplefilter("ignore")
+        assert m.use_backend(backend) == backend
+        for option, value in options.items():
+            setattr(m.settings, option, value)
+        scene(m)
+        m.step(steps)
+        return [[p.x, p.y, p.z, p.vx, p.vy, p.vz] for p in m.mass_lis]
+
+
+def assert_same(expected, actual):
+    """ asserts the values are equal up to tolerance (relative to the largest one) """
+    assert len(expected) == len(actual)
+    scale = max((abs(v) for values in expected for v in values), default=0) or 1
+    difference = max((abs(a - b) for p, q in zip(expected, actual) for a, b in zip(p, q)), default=0)
+    assert difference <= tolerance * scale, "the largest difference is %g (of %g)" % (difference, scale)
+
+
+# tests
+
+@pytest.mark.parametrize("backend", backends)
+@pytest.mark.parametrize("scene, options", [
+    (springs, {}),
+    (gravitational, {"gravity": "pairs"}),
+    (gravitational, {"gravity": "implicit"}),
+    (charged, {"electricity": "pairs"}),
+    (charged, {"electricity": "implicit"}),
+    (colliding, {"collision": "pairs"}),
+    (colliding, {"collision": "implicit"}),
+    (colliding, {"collision": "grid"}),
+], ids=lambda value: value.__name__ if callable(value) else "-".join(value.values()) or "-")
+def test_forces(scene, options, backend):
+    assert_same(run(scene, "pure", **options), run(scene, backend, **options))
+
+
+@pytest.mark.parametrize("backend", backends)
+@pytest.mark.parametrize("integrator", integrators)
+def test_integrators(integrator, backend):
+    options = {"integrator": integrator, "gravity": "implicit", "electricity": "implicit", "collision": "implicit"}
+    assert_same(run(mixed, "pure", **options), run(mixed, backend, **options))
+
+
+@pytest.mark.parametrize("backend", backends)
+def test_workers(backend):
+    options = {"workers": 2, "gravity": "implicit", "electricity": "implicit", "collision": "implicit"}
+    assert_same(run(mixed, "pure", **options), run(mixed, backend, **options))
+
+
+@pytest.mark.parametrize("backend", backends)
+def test_worker_counts(backend):
+    # the chunks don't depend on workers, so any number of them gives the same results
+    options = {"gravity": "implicit", "electricity": "implicit", "collision": "implicit"}
+    results = {workers: run(mixed, backend, workers=workers, **options) for workers in (0, 1, 2, 8)}
+    assert results[1] == results[2] == results[8]
+    assert_same(results[0], results[1])
+
+
+@pytest.mark.parametrize("backend, ignored", [
+    ("pure", {"spring", "gravity", "electricity", "collision"}),
+    ("numpy", {"collision"}),
+])
+def test_ignored_workers(backend, ignored):
+    # the forces set by one thread warn about it, once
+    m = importlib.reload(sys.modules["massspring.massspring"])
+    m.use_backend(backend)
+    m.settings.workers = 2
+    for option in ("gravity", "electricity", "collision"):
+        setattr(m.settings, option, m.implicit)
+    with warnings.catch_warnings(record=True) as caught:
+        warnings.simplefilter("always")
+        mixed(m)
+        m.step(3)
+    warned = [str(w.message).split(" forces")[0].split("the ")[-1] for w in caught
+              if issubclass(w.category, m.Exceptions.WorkersIgnored)]
+    assert sorted(warned) == sorted(ignored)
+
+
+def test_pure_modes():
+    # the solvers without force objects against the force objects themselves
+    for scene, option in ((gravitational, "gravity"), (charged, "electricity"), (colliding, "collision")):
+        assert_same(run(scene, "pure", **{option: "pairs"}), run(scene, "pure", **{option: "implicit"}))
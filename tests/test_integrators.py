@@ -0,0 +1,104 @@
+# -- In the name of God --
+# Project: massspring (mass+spring)
+# File: test_integrators.py
+# Author: Pooya Shams kolahi
+# Inspired by Saeed Sarkarati
+
+"""
+the integrators against the exact motion of a mass on a spring.
+x = A.cos(w.t) and v = -A.w.sin(w.t) with w = (k / m) ^ 0.5.
+
+run with: python -m pytest -q
+"""
+
+import importlib
+import importlib.util
+import math
+import sys
+
+import pytest
+
+import massspring  # noqa: F401 (the package, imported before the module)
+
+k = 100
+nl = 50
+amplitude = 10
+w = k ** .5  # m = 1
+
+
+def oscillator(integrator, backend="pure"):
+    """
+    returns a fresh massspring module with a mass on a spring
+    (tied to a fixed mass) and the mass on the spring.
+    """
+    m = importlib.reload(sys.modules["massspring.massspring"])
+    assert m.use_backend(backend) == backend
+    m.settings.integrator = integrator
+    anchor = m.mass(0, 0, 0, solid=False, bound=False, moveable=False)
+    body = m.mass(nl + amplitude, 0, 0, solid=False, bound=False)
+    m.spring(anchor, body, k=k, nl=nl)
+    return m, body
+
+
+def error(m, body):
+    """ the largest error of the position and of the velocity of the body """
+    t = m.simulation.time
+    return (abs(body.x - nl - amplitude * math.cos(w * t)),
+            abs(body.vx + amplitude * w * math.sin(w * t)))
+
+
+def test_verlet_velocities():
+    # the velocities of verlet are at the same time as the positions,
+    # so both of them get second order errors
+    errors = []
+    for dt in (.004, .002):
+        m, body = oscillator("verlet")
+        m.dt = dt
+        m.step(round(1 / dt))
+        errors.append(error(m, body))
+    for coarse, fine in zip(*errors):
+        assert coarse / fine > 3.5
+    assert max(errors[1]) < 1e-3 * amplitude * w
+
+
+@pytest.mark.parametrize("backend", ["pure", pytest.param("numpy", marks=pytest.mark.skipif(
+    importlib.util.find_spec("numpy") is None, reason="numpy is not installed"))])
+def test_verlet_carried_forces(backend):
+    # the forces set at the end of an update are the ones of the next one
+    m, body = oscillator("verlet", backend)
+    m.dt = .001
+    m.step(10)
+    carried = m.simulation.carried[1]
+    m.empty_all_forces()
+    m.simulation.carried = None
+    m.set_all_forces()
+    assert body.fx == pytest.approx(-k * (body.x - nl))
+    assert [list(f) for f in carried] == [[p.fx, p.fy, p.fz] for p in m.mass_lis]
+
+
+def test_adaptive_leapfrog():
+    # the kick after a change of dt is the average of the two half steps,
+    # so leapfrog stays second order when dt changes in each update
+    errors = []
+    for tolerance in (.1, .05):
+        m, body = oscillator("leapfrog")
+        m.settings.adaptive = True
+        m.settings.tolerance = tolerance
+        m.initialize()
+        while m.simulation.time < 1:
+            m.update()
+        errors.append(error(m, body)[0])
+    assert errors[0] / errors[1] > 3
+    assert errors[1] < 1e-4 * amplitude
+
+
+def test_alternating_leapfrog():
+    errors = []
+    for dt in (.004, .002):
+        m, body = oscillator("leapfrog")
+        m.initialize()
+        for i in range(round(1 / dt / 1.5)):
+            m.dt = dt if i % 2 else 2 * dt
+            m.update()
+        errors.append(error(m, body)[0])
+    assert errors[0] / errors[1] > 3
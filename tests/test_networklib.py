@@ -0,0 +1,96 @@
+# -- In the name of God --
+# Project: massspring (mass+spring)
+# File: test_networklib.py
+# Author: Pooya Shams kolahi
+# Inspired by Saeed Sarkarati
+
+"""
+the delta streams should always give the client the positions of the
+masses and springs of the world, whatever happens to the lists.
+
+run with: python -m pytest -q
+"""
+
+import importlib
+import sys
+
+import massspring  # noqa: F401 (the package, imported before the module)
+from massspring import networklib
+
+
+def fresh():
+    """ returns a fresh massspring module with an empty world """
+    return importlib.reload(sys.modules["massspring.massspring"])
+
+
+def poses(m):
+    """ the positions of the masses and springs of the world, like the decoder returns them """
+    return ([[p.x, p.y, p.z] for p in m.mass_lis],
+            [[[s.m1.x, s.m1.y, s.m1.z], [s.m2.x, s.m2.y, s.m2.z]] for s in m.spring_lis])
+
+
+def decoded(decoder):
+    return decoder.mass_poses(), decoder.spring_poses()
+
+
+def stream(m):
+    return networklib.delta_stream(m.mass_lis, m.spring_lis), networklib.delta_decoder()
+
+
+def test_reordered_masses():
+    m = fresh()
+    a = m.mass(0, 0, 10, solid=False)
+    b = m.mass(50, 0, 20, solid=False)
+    m.mass(100, 0, 30, solid=False)
+    m.spring(a, b)
+    s, decoder = stream(m)
+    decoder.feed(s.next_frame())
+    m.sort_by_z()
+    a.x = 5
+    decoder.feed(s.next_frame())
+    masses, springs = decoded(decoder)
+    assert springs == poses(m)[1]
+    assert sorted(masses) == sorted(poses(m)[0])
+
+
+def test_replaced_spring():
+    # the new spring usually gets the id of the removed one
+    m = fresh()
+    a = m.mass(0, 0, 0, solid=False)
+    b = m.mass(50, 0, 0, solid=False)
+    c = m.mass(100, 0, 0, solid=False)
+    spring = m.spring(a, b)
+    s, decoder = stream(m)
+    decoder.feed(s.next_frame())
+    spring.remove()
+    del spring
+    m.spring(b, c)
+    decoder.feed(s.next_frame())
+    assert decoded(decoder)[1] == [[[50, 0, 0], [100, 0, 0]]]
+
+
+def test_replaced_mass():
+    m = fresh()
+    a = m.mass(0, 0, 0, solid=False)
+    m.mass(50, 0, 0, solid=False)
+    s, decoder = stream(m)
+    decoder.feed(s.next_frame())
+    a.remove()
+    del a
+    m.mass(7, 7, 7, solid=False)
+    decoder.feed(s.next_frame())
+    assert sorted(decoded(decoder)[0]) == [[7, 7, 7], [50, 0, 0]]
+
+
+def test_far_masses():
+    # too far for int32 at the default precision
+    m = fresh()
+    a = m.mass(0, 0, 0, solid=False)
+    s, decoder = stream(m)
+    decoder.feed(s.next_frame())
+    a.x = 3e7
+    decoder.feed(s.next_frame())
+    assert decoded(decoder)[0] == [[3e7, 0, 0]]
+    a.x = 8
+    decoder.feed(s.next_frame())
+    assert decoded(decoder)[0] == [[8, 0, 0]]